@@ -7,16 +7,27 @@ import asyncio
 import logging
 import re
 import math
-from datetime import datetime, timedelta, timezone
-from collections import deque, defaultdict
-from typing import Optional, List, Dict, Any, Tuple
+import signal
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from collections import Counter, deque, defaultdict
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, Sequence, Tuple
+
+try:
+    import uvloop  # быстрее стандартного цикла событий; на Windows недоступен
+except ImportError:
+    uvloop = None
 
 from telegram import Bot, Update
 from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
 
 import config
 from database import NewsDatabase
-from news_collector import NewsCollector
+from news_collector import NewsCollector, news_text
 from post_generator import PostGenerator
 from currency_fetcher import CurrencyFetcher
 
@@ -27,26 +38,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Символы разметки, которые убираем при публикации без Markdown
+_MARKDOWN_STRIP_TABLE = str.maketrans('', '', '*[]()')
+# Экранированные символы и адреса ссылок не участвуют в парной разметке
+_MARKDOWN_INERT_RE = re.compile(r'\\.|\]\([^)]*\)')
+
+# Слова заголовка для сравнения новостей между собой
+_TITLE_WORD_RE = re.compile(r"[а-яa-zё0-9]{4,}")
+_TITLE_STOP_WORDS = frozenset({
+    'когда', 'после', 'будет', 'стало', 'этого', 'также', 'которые', 'россии',
+    'чтобы', 'через', 'между', 'about', 'with', 'that', 'this', 'from'
+})
+
+# Ключ сортировки очередей «важность, затем свежесть» (оба поля к этому моменту всегда заполнены)
+_PRIORITY_SORT_KEY = itemgetter('priority_score', 'published_at')
+# Пары, по которым вечером решаем, публиковать ли обновление курсов
+_CURRENCY_CHANGE_KEYS = ('usd_rub', 'eur_rub', 'cny_rub', 'btc_usd', 'btc_rub')
+# Дольше этого не спим, даже если до ближайшего события по расписанию далеко
+_IDLE_MAX_SLEEP_SECONDS = 3600
+# Снимок собранных лент делится между событиями одного пробуждения, но не старше этого срока
+_NEWS_SNAPSHOT_MAX_AGE_SECONDS = 300
+
+# Флаги «шумовых» списков ключевых слов: все они проверяются одним проходом регулярки
+_NOISE_LOCAL_CRIME = 1
+_NOISE_LOCAL_MARKER = 2
+_NOISE_CRIME = 4
+_NOISE_GLOBAL_CRIME = 8
+_NOISE_LOW_VALUE = 16
+
+
+def _build_noise_matcher() -> Tuple[re.Pattern, Dict[str, int]]:
+    """
+    Одна регулярка по всем шумовым спискам и маска списков для каждого ключевого слова.
+    Поиск идёт опережающей проверкой с каждой позиции, самые длинные слова первыми;
+    в маску слова входят и маски его префиксов, поэтому короткие совпадения не теряются.
+    """
+    masks: Dict[str, int] = {}
+    for flag, keywords in (
+        (_NOISE_LOCAL_CRIME, config.LOCAL_NOISE_CRIME_KEYWORDS),
+        (_NOISE_LOCAL_MARKER, config.LOCAL_NEWS_MARKERS),
+        (_NOISE_CRIME, config.CRIME_CONTENT_KEYWORDS),
+        (_NOISE_GLOBAL_CRIME, config.ALLOWED_GLOBAL_CRIME_KEYWORDS),
+        (_NOISE_LOW_VALUE, config.LOW_VALUE_NEWS_PATTERNS),
+    ):
+        for keyword in keywords:
+            masks[keyword] = masks.get(keyword, 0) | flag
+
+    full_masks: Dict[str, int] = {}
+    for keyword in masks:
+        mask = 0
+        for other, other_mask in masks.items():
+            if keyword.startswith(other):
+                mask |= other_mask
+        full_masks[keyword] = mask
+
+    ordered = sorted(masks, key=len, reverse=True)
+    pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in ordered) + '))')
+    return pattern, full_masks
+
+
+_NOISE_PATTERN, _NOISE_KEYWORD_MASKS = _build_noise_matcher()
+
+
+def _combine_priority(topic: float, keywords: float, source: float, freshness: float) -> float:
+    """Итоговая важность новости из составляющих скоринга."""
+    return (topic + keywords) * source * (0.7 + freshness)
+
 
 class NewsBot:
     """Главный класс бота для публикации новостей в канал."""
 
     def __init__(self):
-        self.bot = Bot(token=config.BOT_TOKEN)
+        # Постоянный пул соединений с HTTP/2: без повторных TLS-рукопожатий между публикациями
+        self.http_request = HTTPXRequest(connection_pool_size=8, pool_timeout=10, http_version='2')
+        self.updates_request = HTTPXRequest(connection_pool_size=1, http_version='2')
+        self.bot = Bot(
+            token=config.BOT_TOKEN,
+            request=self.http_request,
+            get_updates_request=self.updates_request,
+        )
         self.channel_id = config.CHANNEL_ID
         self.database = NewsDatabase(config.DATABASE_PATH)
         self.news_collector = NewsCollector(config.NEWS_SOURCES)
         self.post_generator = PostGenerator(config.MAX_POST_LENGTH)
-        self.currency_fetcher = CurrencyFetcher()
+        self.currency_fetcher = CurrencyFetcher(cache_path=config.CURRENCY_CACHE_PATH)
         self.pending_news: Dict[str, Dict] = {}
         self.msk_tz = timezone(timedelta(hours=3))
-        self.breaking_publish_times = deque()
+        self.breaking_publish_times: deque = deque()  # time.monotonic() срочных публикаций
+        self.channel_send_times = deque()
         self.pending_breaking_digest: List[Dict] = []
         self.last_collector_stats: Dict[str, Dict[str, int]] = {}
         self.last_update_id: Optional[int] = None
         self.last_digest_windows: Dict[str, Tuple[datetime, datetime]] = {}
         self.last_main_digest_compiled_at: Optional[datetime] = None
         self.last_currency_windows: Dict[str, datetime] = {}
+        self.stop_event = asyncio.Event()
+        self._keyword_patterns: Dict[int, re.Pattern] = {}
+        # Кеш недавних новостей по категориям для поиска связанных постов (живёт между циклами)
+        self.related_cache: Dict[str, Tuple[List[Dict], Dict[str, List[int]]]] = {}
+        self.related_cache_expires_at = 0.0
+        # Коэффициенты свежести по целым часам возраста новости (на 30 дней вперёд)
+        half_life = max(config.PRIORITY_RECENCY_HALF_LIFE_HOURS, 1)
+        self._freshness_lut = [math.exp(-hours / half_life) for hours in range(24 * 30)]
+        # Веса из config, к которым обращаемся на каждую новость, держим прямо на экземпляре
+        self._source_weights = {sys.intern(name): weight for name, weight in config.SOURCE_RELIABILITY_WEIGHTS.items()}
+        self._topic_priorities = config.TOPIC_BASE_PRIORITY
+        # Снимок RSS-лент текущего пробуждения: (time.monotonic() сбора, новости)
+        self._news_snapshot: Optional[Tuple[float, List[Dict]]] = None
+        # Расписание событий на текущие сутки: (дата, моменты событий)
+        self._schedule_cache: Optional[Tuple[date, Dict[str, datetime]]] = None
 
         logger.info("Бот инициализирован")
 
@@ -83,8 +183,8 @@ class NewsBot:
         parts = text.split()
 
         if cmd == '/stats':
-            stats24 = self.database.get_news_stats(hours=24)
-            stats7d = self.database.get_news_stats(hours=24 * 7)
+            stats24 = await asyncio.to_thread(self.database.get_news_stats, 24)
+            stats7d = await asyncio.to_thread(self.database.get_news_stats, 24 * 7)
             await self._send_admin_message(
                 "📊 Статистика публикаций\n"
                 f"24ч: {stats24.get('total', 0)} | по категориям: {stats24.get('by_category', {})}\n"
@@ -137,9 +237,48 @@ class NewsBot:
                 )
             await self._send_admin_message("\n".join(lines))
             return
+    async def _wait_channel_slot(self) -> None:
+        """Выдерживает лимит Telegram на число сообщений в канал за минуту."""
+        limit = max(config.CHANNEL_MAX_MESSAGES_PER_MINUTE, 1)
+        while True:
+            now = time.monotonic()
+            while self.channel_send_times and now - self.channel_send_times[0] >= 60:
+                self.channel_send_times.popleft()
+            if len(self.channel_send_times) < limit:
+                self.channel_send_times.append(now)
+                return
+            await asyncio.sleep(60 - (now - self.channel_send_times[0]))
+
+    async def _bot_send_message(self, **kwargs) -> None:
+        try:
+            await self.bot.send_message(**kwargs)
+        except RetryAfter as exc:
+            logger.warning("Telegram ограничил частоту отправки, ждём %s с", exc.retry_after)
+            await asyncio.sleep(exc.retry_after)
+            await self.bot.send_message(**kwargs)
+
+    def _has_unbalanced_markdown(self, text: str) -> bool:
+        """Заранее распознаёт разметку, которую Telegram всё равно отклонит."""
+        if text.count('[') != text.count(']'):
+            return True
+        body = _MARKDOWN_INERT_RE.sub('', text)
+        return body.count('*') % 2 == 1 or body.count('_') % 2 == 1 or body.count('`') % 2 == 1
+
+    async def _send_plain_message(self, text: str) -> None:
+        await self._bot_send_message(
+            chat_id=self.channel_id,
+            text=text.translate(_MARKDOWN_STRIP_TABLE),
+            disable_web_page_preview=False
+        )
+
     async def _send_message(self, text: str) -> bool:
+        await self._wait_channel_slot()
+        if self._has_unbalanced_markdown(text):
+            logger.warning("Несбалансированная Markdown-разметка, публикуем без разметки")
+            await self._send_plain_message(text)
+            return True
         try:
-            await self.bot.send_message(
+            await self._bot_send_message(
                 chat_id=self.channel_id,
                 text=text,
                 parse_mode=ParseMode.MARKDOWN,
@@ -148,12 +287,7 @@ class NewsBot:
             return True
         except Exception as markdown_error:
             logger.warning("Ошибка Markdown форматирования, публикуем без разметки: %s", markdown_error)
-            plain_text = text.replace('*', '').replace('[', '').replace(']', '').replace('(', '').replace(')', '')
-            await self.bot.send_message(
-                chat_id=self.channel_id,
-                text=plain_text,
-                disable_web_page_preview=False
-            )
+            await self._send_plain_message(text)
             return True
 
     async def publish_news(self, news: dict, related_news: Optional[dict] = None) -> bool:
@@ -164,34 +298,63 @@ class NewsBot:
             post_text = self.post_generator.add_category_tag(post_text, categories)
             await self._send_message(post_text)
 
-            logger.info(f"Опубликована новость: {news['title'][:80]}...")
+            logger.info("Опубликована новость: %.80s...", news['title'])
             return True
         except Exception as e:
-            logger.error(f"Ошибка при публикации новости '{news['title']}': {str(e)}")
+            logger.error("Ошибка при публикации новости '%s': %s", news['title'], e)
             return False
 
-    def _title_tokens(self, text: str) -> set:
-        words = re.findall(r"[а-яa-zё0-9]{4,}", text.lower())
-        stop_words = {
-            'когда', 'после', 'будет', 'стало', 'этого', 'также', 'которые', 'россии',
-            'чтобы', 'через', 'между', 'about', 'with', 'that', 'this', 'from'
-        }
-        return {word for word in words if word not in stop_words}
+    def _title_tokens(self, text: str) -> frozenset:
+        words = _TITLE_WORD_RE.findall(text.lower())
+        return frozenset(word for word in words if word not in _TITLE_STOP_WORDS)
+
+    def _news_title_tokens(self, news: Dict) -> frozenset:
+        """Токены заголовка новости; считаются один раз и хранятся в самом словаре."""
+        tokens = news.get('title_tokens')
+        if tokens is None:
+            tokens = self._title_tokens(news.get('title', ''))
+            news['title_tokens'] = tokens
+        return tokens
+
+    def _noise_flags(self, news: Dict) -> int:
+        """Маска сработавших шумовых списков; кешируется в словаре новости, пока не изменился её текст."""
+        text = self._news_text(news)
+        cached = news.get('noise_flags_cache')
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        flags = 0
+        for match in _NOISE_PATTERN.finditer(text):
+            flags |= _NOISE_KEYWORD_MASKS[match.group(1)]
+        news['noise_flags_cache'] = (text, flags)
+        return flags
 
     def is_unwanted_local_news(self, news: Dict) -> bool:
-        text = f"{news.get('title', '')} {news.get('description', '')}".lower()
-        has_crime = any(keyword in text for keyword in config.LOCAL_NOISE_CRIME_KEYWORDS)
-        has_local_marker = any(marker in text for marker in config.LOCAL_NEWS_MARKERS)
-        return has_crime and has_local_marker
+        flags = self._noise_flags(news)
+        return bool(flags & _NOISE_LOCAL_CRIME) and bool(flags & _NOISE_LOCAL_MARKER)
 
     def is_political_news(self, news: Dict) -> bool:
-        text = f"{news.get('title', '')} {news.get('description', '')}".lower()
-        return any(keyword in text for keyword in config.WORLD_KEYWORDS)
+        text = self._news_text(news)
+        return self._has_keyword(text, config.WORLD_KEYWORDS)
 
     def _news_text(self, news: Dict) -> str:
-        return f"{news.get('title', '')} {news.get('description', '')}".lower()
-
-    def _keyword_score(self, text: str, keywords: List[str]) -> int:
+        """Текст новости в нижнем регистре (сборщик готовит его при загрузке ленты)."""
+        return news_text(news)
+
+    def _keyword_pattern(self, keywords: Sequence[str]) -> re.Pattern:
+        """Одна скомпилированная альтернация на список ключевых слов из config."""
+        pattern = self._keyword_patterns.get(id(keywords))
+        if pattern is None:
+            pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+            self._keyword_patterns[id(keywords)] = pattern
+        return pattern
+
+    def _has_keyword(self, text: str, keywords: Sequence[str]) -> bool:
+        return bool(keywords) and self._keyword_pattern(keywords).search(text) is not None
+
+    def _keyword_score(self, text: str, keywords: Sequence[str]) -> int:
+        # Быстрый отсев одним проходом регулярки; точный подсчёт — только если есть совпадение
+        if not self._has_keyword(text, keywords):
+            return 0
         return sum(1 for keyword in keywords if keyword in text)
 
     def _detect_region(self, news: Dict) -> str:
@@ -214,7 +377,7 @@ class NewsBot:
         conflict_score = self._keyword_score(text, config.ARMED_CONFLICT_KEYWORDS)
         if conflict_score == 0:
             return False
-        has_noise = any(keyword in text for keyword in config.NON_CONFLICT_NOISE_KEYWORDS)
+        has_noise = self._has_keyword(text, config.NON_CONFLICT_NOISE_KEYWORDS)
         return not has_noise
 
     def _is_economy_news(self, news: Dict) -> bool:
@@ -238,6 +401,15 @@ class NewsBot:
         return politics_score > 0
 
     def _detect_topic(self, news: Dict) -> str:
+        text = self._news_text(news)
+        cached = news.get('topic_cache')
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        topic = self._classify_topic(news)
+        news['topic_cache'] = (text, topic)
+        return topic
+
+    def _classify_topic(self, news: Dict) -> str:
         if self._is_armed_conflict_news(news):
             return 'конфликт'
         if self._is_economy_news(news):
@@ -269,13 +441,25 @@ class NewsBot:
 
     def _source_weight(self, news: Dict) -> float:
         sources = news.get('sources') or [news.get('source', '')]
-        weights = [config.SOURCE_RELIABILITY_WEIGHTS.get(src, 1.0) for src in sources if src]
+        source_weights = self._source_weights
+        weights = [source_weights.get(src, 1.0) for src in sources if src]
         return max(weights) if weights else 1.0
 
-    def _importance_keyword_score(self, news: Dict) -> float:
+    def _importance_hits(self, news: Dict) -> Tuple[int, int]:
+        """Число маркеров высокой и средней важности; кешируется, пока не изменился текст новости."""
         text = self._news_text(news)
-        high = self._keyword_score(text, config.HIGH_IMPORTANCE_KEYWORDS)
-        medium = self._keyword_score(text, config.MEDIUM_IMPORTANCE_KEYWORDS)
+        cached = news.get('importance_hits_cache')
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        hits = (
+            self._keyword_score(text, config.HIGH_IMPORTANCE_KEYWORDS),
+            self._keyword_score(text, config.MEDIUM_IMPORTANCE_KEYWORDS),
+        )
+        news['importance_hits_cache'] = (text, hits)
+        return hits
+
+    def _importance_keyword_score(self, news: Dict) -> float:
+        high, medium = self._importance_hits(news)
         return high * 1.2 + medium * 0.5
 
     def _freshness_score(self, news: Dict, now: Optional[datetime] = None) -> float:
@@ -284,25 +468,33 @@ class NewsBot:
         if not isinstance(published_at, datetime):
             return 1.0
         age_hours = max((now_value - published_at).total_seconds() / 3600, 0)
-        half_life = max(config.PRIORITY_RECENCY_HALF_LIFE_HOURS, 1)
-        return math.exp(-age_hours / half_life)
+        return self._freshness_lut[min(int(age_hours), len(self._freshness_lut) - 1)]
 
     def _news_priority_score(self, news: Dict, now: Optional[datetime] = None) -> float:
         topic = self._detect_topic(news)
-        topic_priority = config.TOPIC_BASE_PRIORITY.get(topic, 1.0)
+        topic_priority = self._topic_priorities.get(topic, 1.0)
         source_priority = self._source_weight(news)
         keyword_priority = self._importance_keyword_score(news)
         freshness_priority = self._freshness_score(news, now)
 
-        return (topic_priority + keyword_priority) * source_priority * (0.7 + freshness_priority)
+        return _combine_priority(topic_priority, keyword_priority, source_priority, freshness_priority)
+
+    def _score_news_batch(self, items: List[Dict], now: Optional[datetime] = None) -> None:
+        """
+        Проставляет priority_score всей пачке за один проход.
+        Момент времени берётся один раз на пачку, а не на каждую новость.
+        """
+        now_value = now or datetime.now()
+        for news in items:
+            news['priority_score'] = self._news_priority_score(news, now_value)
 
     def _priority_breakdown(self, news: Dict, now: Optional[datetime] = None) -> Dict[str, object]:
         topic = self._detect_topic(news)
-        topic_priority = config.TOPIC_BASE_PRIORITY.get(topic, 1.0)
+        topic_priority = self._topic_priorities.get(topic, 1.0)
         source_priority = self._source_weight(news)
         keyword_priority = self._importance_keyword_score(news)
         freshness_priority = self._freshness_score(news, now)
-        score = (topic_priority + keyword_priority) * source_priority * (0.7 + freshness_priority)
+        score = _combine_priority(topic_priority, keyword_priority, source_priority, freshness_priority)
         return {
             'topic': topic,
             'topic_priority': topic_priority,
@@ -313,8 +505,7 @@ class NewsBot:
         }
 
     def is_breaking_news(self, news: Dict, threshold: Optional[float] = None) -> bool:
-        text = self._news_text(news)
-        high_hits = self._keyword_score(text, config.HIGH_IMPORTANCE_KEYWORDS)
+        high_hits = self._importance_hits(news)[0]
         score = news.get('priority_score', 0.0)
         effective_threshold = threshold if threshold is not None else config.BREAKING_NEWS_MIN_PRIORITY
         return high_hits >= 2 or score >= effective_threshold
@@ -325,25 +516,24 @@ class NewsBot:
     def is_excluded_russian_topic(self, news: Dict) -> bool:
         if news.get('source') not in config.EXCLUDED_RUSSIAN_SOURCES:
             return False
-        text = f"{news.get('title', '')} {news.get('description', '')}".lower()
-        return any(keyword in text for keyword in config.EXCLUDED_RUSSIAN_TOPICS_KEYWORDS)
+        text = self._news_text(news)
+        return self._has_keyword(text, config.EXCLUDED_RUSSIAN_TOPICS_KEYWORDS)
 
     def is_blocked_crime_news(self, news: Dict) -> bool:
         """Блокирует криминальный контент, кроме глобально значимого и терактов."""
-        text = f"{news.get('title', '')} {news.get('description', '')}".lower()
+        flags = self._noise_flags(news)
 
-        has_crime = any(keyword in text for keyword in config.CRIME_CONTENT_KEYWORDS)
+        has_crime = bool(flags & _NOISE_CRIME)
         if not has_crime:
             return False
 
-        is_allowed_global = any(keyword in text for keyword in config.ALLOWED_GLOBAL_CRIME_KEYWORDS)
+        is_allowed_global = bool(flags & _NOISE_GLOBAL_CRIME)
         return not is_allowed_global
 
     def is_low_value_news(self, news: Dict) -> bool:
         """Фильтрует пустые/кликбейтные новости-затычки."""
         title = (news.get('title') or '').strip().lower()
         description = (news.get('description') or '').strip().lower()
-        text = f"{title} {description}".strip()
 
         if not title or len(title) < 12:
             return True
@@ -373,50 +563,61 @@ class NewsBot:
             if overlap >= 0.9 and len(description_tokens) <= len(title_tokens) + 2:
                 return True
 
-        if any(pattern in text for pattern in config.LOW_VALUE_NEWS_PATTERNS):
+        if self._noise_flags(news) & _NOISE_LOW_VALUE:
             # Если описание при этом очень короткое — почти точно затычка
             if len(normalized_description) < 220:
                 return True
 
         return False
 
+    def _normalized_url(self, news: Dict) -> str:
+        """Нормализованный URL новости; вычисляется один раз и хранится в самом словаре."""
+        return self.database.normalize_news_url(news)
+
     def group_news_by_url(self, news_list: List[Dict]) -> Dict[str, Dict]:
         grouped = {}
         now = datetime.now()
 
         for news in news_list:
             categories = news.get('categories') or [news.get('category', 'general')]
-            normalized_url = self.database.normalize_url(news['url'])
-            if normalized_url not in grouped:
+            normalized_url = self._normalized_url(news)
+            entry = grouped.get(normalized_url)
+            if entry is None:
                 grouped[normalized_url] = {
                     'title': news['title'],
                     'url': news['url'],
+                    'normalized_url': normalized_url,
                     'description': news.get('description', ''),
                     'source': news['source'],
                     'categories': list(dict.fromkeys(categories)),
                     'sources': [news['source']],
-                    'images': news.get('images', []),
+                    'images': list(news.get('images', [])),
                     'published_at': news['published_at'],
                     'priority_score': news.get('priority_score', 0.0),
                     'first_seen_at': now,
                     'combined_items': [news]
                 }
-            else:
-                for category in categories:
-                    if category not in grouped[normalized_url]['categories']:
-                        grouped[normalized_url]['categories'].append(category)
-                if news['source'] not in grouped[normalized_url]['sources']:
-                    grouped[normalized_url]['sources'].append(news['source'])
-                for image_url in news.get('images', []):
-                    if image_url not in grouped[normalized_url]['images']:
-                        grouped[normalized_url]['images'].append(image_url)
-                if news.get('description') and len(news['description']) > len(grouped[normalized_url]['description']):
-                    grouped[normalized_url]['description'] = news['description']
-                if news['published_at'] > grouped[normalized_url]['published_at']:
-                    grouped[normalized_url]['published_at'] = news['published_at']
-                if news.get('priority_score', 0.0) > grouped[normalized_url].get('priority_score', 0.0):
-                    grouped[normalized_url]['priority_score'] = news.get('priority_score', 0.0)
-                grouped[normalized_url]['combined_items'].append(news)
+                continue
+
+            entry_categories = entry['categories']
+            for category in categories:
+                if category not in entry_categories:
+                    entry_categories.append(category)
+            if news['source'] not in entry['sources']:
+                entry['sources'].append(news['source'])
+            entry_images = entry['images']
+            for image_url in news.get('images', []):
+                if image_url not in entry_images:
+                    entry_images.append(image_url)
+            description = news.get('description')
+            if description and len(description) > len(entry['description']):
+                entry['description'] = description
+            if news['published_at'] > entry['published_at']:
+                entry['published_at'] = news['published_at']
+            priority_score = news.get('priority_score', 0.0)
+            if priority_score > entry['priority_score']:
+                entry['priority_score'] = priority_score
+            entry['combined_items'].append(news)
 
         return grouped
 
@@ -463,8 +664,8 @@ class NewsBot:
         return now - first_seen >= timedelta(minutes=config.PUBLISH_DELAY_MINUTES)
 
     def _similarity(self, left: Dict, right: Dict) -> float:
-        left_tokens = self._title_tokens(left.get('title', ''))
-        right_tokens = self._title_tokens(right.get('title', ''))
+        left_tokens = self._news_title_tokens(left)
+        right_tokens = self._news_title_tokens(right)
         if not left_tokens or not right_tokens:
             return 0.0
         intersection = len(left_tokens & right_tokens)
@@ -497,8 +698,13 @@ class NewsBot:
             all_urls = []
             all_descriptions = []
             all_combined_items = []
+            max_published = None
+            max_priority = 0.0
 
             for news in cluster:
+                if max_published is None or news['published_at'] > max_published:
+                    max_published = news['published_at']
+                max_priority = max(max_priority, news.get('priority_score', 0.0))
                 all_categories.extend(news.get('categories', []))
                 all_sources.extend(news.get('sources', [news.get('source', 'Unknown')]))
                 all_images.extend(news.get('images', []))
@@ -527,8 +733,8 @@ class NewsBot:
                 'source': ', '.join(unique_sources),
                 'sources': unique_sources,
                 'categories': unique_categories,
-                'published_at': max(news['published_at'] for news in cluster),
-                'priority_score': max(news.get('priority_score', 0.0) for news in cluster),
+                'published_at': max_published,
+                'priority_score': max_priority,
                 'images': unique_images,
                 'is_merged_topic': True,
                 'topic_size': len(cluster),
@@ -537,24 +743,77 @@ class NewsBot:
 
         return merged
 
-    def _find_related_news(self, news: Dict) -> Optional[Dict]:
-        for category in news.get('categories', []):
-            recent_news = self.database.get_recent_news_by_category(category, hours=24, limit=3)
+    def _build_related_index(self, recent_news: List[Dict]) -> Dict[str, List[int]]:
+        """Строит инвертированный индекс «слово заголовка → позиции новостей»."""
+        index: Dict[str, List[int]] = defaultdict(list)
+        for position, recent in enumerate(recent_news):
+            for word in self._news_title_tokens(recent):
+                index[word].append(position)
+        return index
+
+    def _current_related_cache(self) -> Dict[str, Tuple[List[Dict], Dict[str, List[int]]]]:
+        """Возвращает кеш недавних новостей, сбрасывая его по истечении TTL."""
+        now = time.monotonic()
+        if now >= self.related_cache_expires_at:
+            self.related_cache = {}
+            self.related_cache_expires_at = now + max(config.RECENT_NEWS_CACHE_TTL_SECONDS, 0)
+        return self.related_cache
+
+    def _fill_related_cache(
+        self,
+        cache: Dict[str, Tuple[List[Dict], Dict[str, List[int]]]],
+        categories: List[str]
+    ) -> None:
+        """Догружает в кеш недавние новости по недостающим категориям одним запросом."""
+        missing = [category for category in dict.fromkeys(categories) if category not in cache]
+        if not missing:
+            return
+        fetched = self.database.get_recent_news_by_categories(missing, hours=24, limit_per_category=3)
+        for category in missing:
+            recent_news = fetched.get(category, [])
+            cache[category] = (recent_news, self._build_related_index(recent_news))
+
+    def _find_related_news(
+        self,
+        news: Dict,
+        related_cache: Optional[Dict[str, Tuple[List[Dict], Dict[str, List[int]]]]] = None
+    ) -> Optional[Dict]:
+        categories = news.get('categories', [])
+        if not categories:
+            return None
+
+        cache = related_cache if related_cache is not None else {}
+        self._fill_related_cache(cache, categories)
+
+        news_words = self._news_title_tokens(news)
+        for category in categories:
+            recent_news, index = cache[category]
             if not recent_news:
                 continue
-            news_words = self._title_tokens(news['title'])
-            for recent in recent_news:
-                recent_words = self._title_tokens(recent['title'])
-                if len(news_words & recent_words) >= 2:
-                    return recent
+            hits = Counter(position for word in news_words for position in index.get(word, ()))
+            matched = [position for position, count in hits.items() if count >= 2]
+            if matched:
+                return recent_news[min(matched)]
         return None
 
+    async def _get_news_snapshot(self) -> List[Dict]:
+        """
+        Новости из всех лент, собранные один раз на пробуждение: дайджесты и срочные публикации,
+        совпавшие по времени, не качают ленты повторно. Каждый вызов получает свои копии словарей.
+        """
+        snapshot = self._news_snapshot
+        if snapshot is None or time.monotonic() - snapshot[0] > _NEWS_SNAPSHOT_MAX_AGE_SECONDS:
+            all_news = await self.news_collector.collect_all_news()
+            self.last_collector_stats = self.news_collector.last_fetch_stats
+            snapshot = (time.monotonic(), all_news)
+            self._news_snapshot = snapshot
+        return [dict(news) for news in snapshot[1]]
+
     async def process_and_publish_news(self, breaking_only: bool = False):
         try:
             logger.info("Начало сбора новостей%s...", " (режим срочных)" if breaking_only else "")
-            all_news = await self.news_collector.collect_all_news()
-            self.last_collector_stats = self.news_collector.last_fetch_stats
-            new_news = self.news_collector.filter_new_news(all_news, self.database)
+            all_news = await self._get_news_snapshot()
+            new_news = await asyncio.to_thread(self.news_collector.filter_new_news, all_news, self.database)
             effective_breaking_threshold = self._adaptive_breaking_threshold(len(new_news))
 
             filtered_news = []
@@ -565,6 +824,8 @@ class NewsBot:
             skipped_duplicates = 0
             skipped_content_duplicates = 0
             seen_content_hashes = set()
+            filtered_titles = set()
+            filtered_urls = set()
 
             for news in new_news:
                 if self.is_excluded_russian_topic(news):
@@ -586,12 +847,8 @@ class NewsBot:
                     dropped_low_value += 1
                     continue
                 normalized_title = self.database.normalize_title(news['title'])
-                normalized_url = self.database.normalize_url(news['url'])
-                if any(
-                    normalized_title == self.database.normalize_title(item['title'])
-                    or normalized_url == self.database.normalize_url(item['url'])
-                    for item in filtered_news
-                ):
+                normalized_url = self._normalized_url(news)
+                if normalized_title in filtered_titles or normalized_url in filtered_urls:
                     skipped_duplicates += 1
                     continue
                 content_hash = self.database.generate_content_hash(
@@ -620,19 +877,21 @@ class NewsBot:
                 if breaking_only and not news['is_breaking']:
                     continue
                 filtered_news.append(news)
+                filtered_titles.add(normalized_title)
+                filtered_urls.add(normalized_url)
 
             if dropped_non_political:
-                logger.info(f"Отфильтровано нерелевантных новостей: {dropped_non_political}")
+                logger.info("Отфильтровано нерелевантных новостей: %s", dropped_non_political)
             if dropped_local_noise:
-                logger.info(f"Отфильтровано локальных криминальных новостей: {dropped_local_noise}")
+                logger.info("Отфильтровано локальных криминальных новостей: %s", dropped_local_noise)
             if dropped_crime:
-                logger.info(f"Отфильтровано криминального контента: {dropped_crime}")
+                logger.info("Отфильтровано криминального контента: %s", dropped_crime)
             if dropped_low_value:
-                logger.info(f"Отфильтровано новостей-затычек: {dropped_low_value}")
+                logger.info("Отфильтровано новостей-затычек: %s", dropped_low_value)
             if skipped_duplicates:
-                logger.info(f"Пропущено дубликатов в пакете: {skipped_duplicates}")
+                logger.info("Пропущено дубликатов в пакете: %s", skipped_duplicates)
             if skipped_content_duplicates:
-                logger.info(f"Пропущено дубликатов по содержанию: {skipped_content_duplicates}")
+                logger.info("Пропущено дубликатов по содержанию: %s", skipped_content_duplicates)
 
             grouped_news = self.group_news_by_url(filtered_news)
             self.add_to_pending(grouped_news)
@@ -651,56 +910,69 @@ class NewsBot:
                 return
 
             matured_news = list(matured_by_url.values())
-            matured_news.sort(
-                key=lambda x: (x.get('priority_score', 0.0), x['published_at']),
-                reverse=True
-            )
+            matured_news.sort(key=_PRIORITY_SORT_KEY, reverse=True)
             publish_queue = self.merge_similar_news(matured_news)
-            publish_queue.sort(
-                key=lambda x: (x.get('priority_score', 0.0), x['published_at']),
-                reverse=True
-            )
+            publish_queue.sort(key=_PRIORITY_SORT_KEY, reverse=True)
 
             published_count = 0
             published_urls = set()
+            related_cache = self._current_related_cache()
+            await asyncio.to_thread(
+                self._fill_related_cache,
+                related_cache,
+                [
+                    category
+                    for news in publish_queue if not news.get('is_merged_topic')
+                    for category in news.get('categories', [])
+                ]
+            )
 
             for news in publish_queue:
                 if published_count >= config.MAX_POSTS_PER_PUBLISH_CYCLE:
                     break
-                if breaking_only and self._breaking_limit_reached(datetime.now(self.msk_tz)):
+                now_monotonic = time.monotonic()
+                if breaking_only and self._breaking_limit_reached(now_monotonic):
                     self.pending_breaking_digest.append(news)
                     continue
-                related_news = self._find_related_news(news)
+                # В сводке по теме связанная новость не выводится, поиск не нужен
+                related_news = None if news.get('is_merged_topic') else self._find_related_news(news, related_cache)
                 success = await self.publish_news(news, related_news)
                 if not success:
                     continue
                 if breaking_only and news.get('is_breaking'):
-                    self._record_breaking_publish(datetime.now(self.msk_tz))
+                    self._record_breaking_publish(now_monotonic)
 
+                rows_to_save = []
+                saved_categories = set()
                 for item in news.get('combined_items', [news]):
                     item_categories = item.get('categories', [item.get('category', 'general')])
                     item_sources = item.get('sources', [item.get('source', 'Unknown')])
+                    saved_categories.update(item_categories)
                     for category in item_categories:
-                        self.database.save_news(
-                            title=item['title'],
-                            url=item['url'],
-                            source=item_sources[0] if item_sources else 'Unknown',
-                            category=category,
-                            published_at=item.get('published_at', news['published_at']),
-                            description=item.get('description', news.get('description', ''))
-                        )
-                    normalized_url = self.database.normalize_url(item['url'])
-                    published_urls.add(normalized_url)
+                        rows_to_save.append({
+                            'title': item['title'],
+                            'url': item['url'],
+                            'source': item_sources[0] if item_sources else 'Unknown',
+                            'category': category,
+                            'published_at': item.get('published_at', news['published_at']),
+                            'description': item.get('description', news.get('description', ''))
+                        })
+                    published_urls.add(self._normalized_url(item))
+                await asyncio.to_thread(self.database.save_news_bulk, rows_to_save)
+                # Только что сохранённые новости должны попадать в поиск связанных: сбрасываем
+                # их категории и сразу догружаем заново в рабочем потоке, а не в цикле событий
+                for category in saved_categories:
+                    related_cache.pop(category, None)
+                await asyncio.to_thread(self._fill_related_cache, related_cache, list(saved_categories))
 
                 published_count += 1
-                await asyncio.sleep(5)
 
             for normalized_url in published_urls:
                 self.pending_news.pop(normalized_url, None)
 
-            logger.info(f"Опубликовано новостей: {published_count}")
+            logger.info("Опубликовано новостей: %s", published_count)
         except Exception as e:
-            logger.error(f"Ошибка при обработке новостей: {str(e)}", exc_info=True)
+            logger.error("Ошибка при обработке новостей: %s", e, exc_info=True)
 
     def _to_msk(self, value: datetime) -> datetime:
         if value.tzinfo is None:
@@ -721,6 +993,16 @@ class NewsBot:
             },
         }
 
+    def _news_section_path(self, news: Dict) -> Optional[Tuple[str, str]]:
+        """Рубрика дайджеста; кешируется в словаре новости, пока не изменился её текст."""
+        text = self._news_text(news)
+        cached = news.get('section_path_cache')
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        path = self._digest_section_path(news)
+        news['section_path_cache'] = (text, path)
+        return path
+
     def _digest_section_path(self, news: Dict) -> Optional[Tuple[str, str]]:
         topic = self._detect_topic(news)
         region = self._detect_region(news)
@@ -752,41 +1034,38 @@ class NewsBot:
         if self.is_low_value_news(news):
             return False
 
-        if not self._digest_section_path(news):
-            return False
-
-        news['priority_score'] = self._news_priority_score(news)
-        return True
+        return self._news_section_path(news) is not None
 
     def _deduplicate_news(self, items: List[Dict]) -> List[Dict]:
-        seen_urls = set()
-        seen_hashes = set()
+        # Одно множество с префиксами ключей; хеш контента считаем, только если URL не повторился
+        seen = set()
         unique = []
 
         for item in items:
-            normalized_url = self.database.normalize_url(item.get('url', ''))
+            normalized_url = self._normalized_url(item)
+            url_key = 'u:' + normalized_url if normalized_url else None
+            if url_key and url_key in seen:
+                continue
+
             content_hash = self.database.generate_content_hash(
                 item.get('title', ''),
                 item.get('description', '')
             )
-
-            if normalized_url and normalized_url in seen_urls:
-                continue
-            if content_hash and content_hash in seen_hashes:
+            hash_key = 'c:' + content_hash if content_hash else None
+            if hash_key and hash_key in seen:
                 continue
 
-            if normalized_url:
-                seen_urls.add(normalized_url)
-            if content_hash:
-                seen_hashes.add(content_hash)
+            if url_key:
+                seen.add(url_key)
+            if hash_key:
+                seen.add(hash_key)
             unique.append(item)
 
         return unique
 
     async def _collect_digest_news(self, start_at: datetime, end_at: datetime) -> List[Dict]:
-        all_news = await self.news_collector.collect_all_news()
-        self.last_collector_stats = self.news_collector.last_fetch_stats
-        new_news = self.news_collector.filter_new_news(all_news, self.database)
+        all_news = await self._get_news_snapshot()
+        new_news = await asyncio.to_thread(self.news_collector.filter_new_news, all_news, self.database)
 
         in_window = []
         for news in new_news:
@@ -797,13 +1076,14 @@ class NewsBot:
                 continue
             in_window.append(news)
 
-        in_window.sort(key=lambda x: (x.get('priority_score', 0.0), x.get('published_at', end_at)), reverse=True)
+        self._score_news_batch(in_window)
+        in_window.sort(key=_PRIORITY_SORT_KEY, reverse=True)
         return self._deduplicate_news(in_window)
 
     def _group_for_sections(self, items: List[Dict]) -> Dict[str, Dict[str, List[Dict]]]:
         sections = self._digest_sections_template()
         for item in items:
-            path = self._digest_section_path(item)
+            path = self._news_section_path(item)
             if not path:
                 continue
             major, sub = path
@@ -835,15 +1115,18 @@ class NewsBot:
         post_text = self.post_generator.format_structured_digest_post(title, sections, end_at)
         await self._send_message(post_text)
 
-        for item in digest_news:
-            self.database.save_news(
-                title=item['title'],
-                url=item['url'],
-                source=item.get('source', 'Unknown'),
-                category=f'digest_{digest_type}',
-                published_at=item.get('published_at', end_at),
-                description=item.get('description', '')
-            )
+        rows_to_save = [
+            {
+                'title': item['title'],
+                'url': item['url'],
+                'source': item.get('source', 'Unknown'),
+                'category': f'digest_{digest_type}',
+                'published_at': item.get('published_at', end_at),
+                'description': item.get('description', ''),
+            }
+            for item in digest_news
+        ]
+        await asyncio.to_thread(self.database.save_news_bulk, rows_to_save)
 
         self.last_digest_windows[digest_type] = (start_at, end_at)
         if digest_type == 'main':
@@ -883,17 +1166,69 @@ class NewsBot:
             digest_type='evening'
         )
 
-    def _scheduled_digest_targets(self) -> Dict[str, datetime]:
-        now = datetime.now(self.msk_tz)
-        return {
-            'main': now.replace(hour=config.DIGEST_MAIN_HOUR_MSK, minute=config.DIGEST_MAIN_MINUTE_MSK, second=0, microsecond=0),
-            'supplement': now.replace(hour=config.DIGEST_SUPPLEMENT_HOUR_MSK, minute=config.DIGEST_SUPPLEMENT_MINUTE_MSK, second=0, microsecond=0),
-            'evening': now.replace(hour=config.DIGEST_EVENING_HOUR_MSK, minute=config.DIGEST_EVENING_MINUTE_MSK, second=0, microsecond=0),
+    def _daily_schedule(self, now_msk: datetime) -> Dict[str, datetime]:
+        """
+        Моменты всех событий по расписанию на день now_msk.
+        Собираются один раз за сутки и переиспользуются до смены даты.
+        """
+        today = now_msk.date()
+        cached = self._schedule_cache
+        if cached is not None and cached[0] == today:
+            return cached[1]
+
+        day_start = now_msk.replace(hour=0, minute=0, second=0, microsecond=0)
+        schedule = {
+            'main': (config.DIGEST_MAIN_HOUR_MSK, config.DIGEST_MAIN_MINUTE_MSK),
+            'supplement': (config.DIGEST_SUPPLEMENT_HOUR_MSK, config.DIGEST_SUPPLEMENT_MINUTE_MSK),
+            'evening': (config.DIGEST_EVENING_HOUR_MSK, config.DIGEST_EVENING_MINUTE_MSK),
+            'currency_daily': (config.CURRENCY_DAILY_HOUR_MSK, config.CURRENCY_DAILY_MINUTE_MSK),
+            'currency_evening': (config.CURRENCY_EVENING_HOUR_MSK, config.CURRENCY_EVENING_MINUTE_MSK),
+        }
+        targets = {
+            name: day_start.replace(hour=hour, minute=minute)
+            for name, (hour, minute) in schedule.items()
         }
+        self._schedule_cache = (today, targets)
+        return targets
+
+    def _next_scheduled_event(self, now_msk: datetime) -> datetime:
+        """Ближайшее событие по расписанию (дайджест или пост курсов) строго после now_msk."""
+        targets = self._daily_schedule(now_msk)
+        names = ['main', 'supplement', 'evening', 'currency_daily']
+        if config.CURRENCY_EVENING_UPDATE_ENABLED:
+            names.append('currency_evening')
+
+        upcoming = []
+        for name in names:
+            target = targets[name]
+            if target <= now_msk:
+                target += timedelta(days=1)
+            upcoming.append(target)
+        return min(upcoming)
+
+    def _has_overdue_event(self, now_msk: datetime) -> bool:
+        """Есть ли сегодняшнее событие по расписанию, время которого прошло, а публикации не было."""
+        targets = self._daily_schedule(now_msk)
+        today = now_msk.date().isoformat()
+        for digest_type in ('main', 'supplement', 'evening'):
+            if now_msk >= targets[digest_type] and self.last_digest_windows.get(digest_type, (None, None))[1] is None:
+                return True
+
+        slots = ['daily']
+        if config.CURRENCY_EVENING_UPDATE_ENABLED:
+            slots.append('evening')
+        for slot in slots:
+            last = self.last_currency_windows.get(slot)
+            if now_msk >= targets[f'currency_{slot}'] and not (last and last.date().isoformat() == today):
+                return True
+        return False
+
+    def _scheduled_digest_targets(self, now_msk: Optional[datetime] = None) -> Dict[str, datetime]:
+        return self._daily_schedule(now_msk or datetime.now(self.msk_tz))
 
     async def _run_scheduled_digests(self, now_msk: datetime) -> None:
         today = now_msk.date().isoformat()
-        targets = self._scheduled_digest_targets()
+        targets = self._scheduled_digest_targets(now_msk)
 
         if now_msk >= targets['main'] and self.last_digest_windows.get('main', (None, None))[1] is None:
             await self.publish_main_digest()
@@ -921,14 +1256,14 @@ class NewsBot:
             return max(1.0, base - delta * 0.5)
         return base
 
-    def _breaking_limit_reached(self, now_msk: datetime) -> bool:
-        cutoff = now_msk - timedelta(hours=1)
+    def _breaking_limit_reached(self, now_monotonic: float) -> bool:
+        cutoff = now_monotonic - 3600
         while self.breaking_publish_times and self.breaking_publish_times[0] < cutoff:
             self.breaking_publish_times.popleft()
         return len(self.breaking_publish_times) >= config.BREAKING_MAX_PER_HOUR
 
-    def _record_breaking_publish(self, now_msk: datetime) -> None:
-        self.breaking_publish_times.append(now_msk)
+    def _record_breaking_publish(self, now_monotonic: float) -> None:
+        self.breaking_publish_times.append(now_monotonic)
 
     async def _publish_pending_breaking_digest(self, now_msk: datetime) -> None:
         if not self.pending_breaking_digest:
@@ -941,15 +1276,18 @@ class NewsBot:
         )[:config.BREAKING_MINI_DIGEST_MAX_ITEMS]
         text = self.post_generator.format_digest_post(heading, items, now_msk)
         await self._send_message(text)
-        for item in items:
-            self.database.save_news(
-                title=item['title'],
-                url=item['url'],
-                source=item.get('source', 'Unknown'),
-                category='breaking_digest',
-                published_at=item.get('published_at', now_msk),
-                description=item.get('description', '')
-            )
+        rows_to_save = [
+            {
+                'title': item['title'],
+                'url': item['url'],
+                'source': item.get('source', 'Unknown'),
+                'category': 'breaking_digest',
+                'published_at': item.get('published_at', now_msk),
+                'description': item.get('description', ''),
+            }
+            for item in items
+        ]
+        await asyncio.to_thread(self.database.save_news_bulk, rows_to_save)
         self.pending_breaking_digest.clear()
 
     def _currency_slot_key(self, slot: str, now_msk: datetime) -> str:
@@ -962,12 +1300,11 @@ class NewsBot:
 
     def _currency_changed_significantly(self, previous: Dict, current: Dict) -> bool:
         threshold = max(config.CURRENCY_SIGNIFICANT_CHANGE_PERCENT, 0.1)
-        keys = ('usd_rub', 'eur_rub', 'cny_rub', 'btc_usd', 'btc_rub')
-        max_change = 0.0
-        for key in keys:
-            change = self._currency_percent_change(previous.get(key), current.get(key))
-            max_change = max(max_change, change)
-        return max_change >= threshold
+        # Достаточно одной пары, перешедшей порог, — остальные не считаем
+        return any(
+            self._currency_percent_change(previous.get(key), current.get(key)) >= threshold
+            for key in _CURRENCY_CHANGE_KEYS
+        )
 
     async def publish_currency_rates(self, slot: str, force: bool = False) -> bool:
         now_msk = datetime.now(self.msk_tz)
@@ -992,7 +1329,7 @@ class NewsBot:
 
         post_text = self.post_generator.format_currency_post(rates, now_msk)
         await self._send_message(post_text)
-        self.database.save_currency_post(slot_key, rates)
+        await asyncio.to_thread(self.database.save_currency_post, slot_key, rates)
         self.last_currency_windows[slot] = now_msk
         logger.info('Опубликован сервисный пост с курсами (%s)', slot)
         return True
@@ -1000,18 +1337,9 @@ class NewsBot:
     async def _run_scheduled_currency_posts(self, now_msk: datetime) -> None:
         today = now_msk.date().isoformat()
 
-        daily_target = now_msk.replace(
-            hour=config.CURRENCY_DAILY_HOUR_MSK,
-            minute=config.CURRENCY_DAILY_MINUTE_MSK,
-            second=0,
-            microsecond=0
-        )
-        evening_target = now_msk.replace(
-            hour=config.CURRENCY_EVENING_HOUR_MSK,
-            minute=config.CURRENCY_EVENING_MINUTE_MSK,
-            second=0,
-            microsecond=0
-        )
+        targets = self._daily_schedule(now_msk)
+        daily_target = targets['currency_daily']
+        evening_target = targets['currency_evening']
 
         daily_last = self.last_currency_windows.get('daily')
         daily_done_today = bool(daily_last and daily_last.date().isoformat() == today)
@@ -1027,7 +1355,7 @@ class NewsBot:
     async def _send_admin_report(self, now_msk: datetime) -> None:
         if not config.ADMIN_CHAT_ID:
             return
-        stats = self.database.get_news_stats()
+        stats = await asyncio.to_thread(self.database.get_news_stats)
         source_stats = self.last_collector_stats
         source_lines = []
         for source, values in sorted(source_stats.items(), key=lambda x: x[0]):
@@ -1051,8 +1379,41 @@ class NewsBot:
     async def run_continuously(self):
         logger.info("Бот запущен. Работают три окна дайджеста (12:00, 12:20, 19:00 МСК) + режим срочных новостей.")
 
-        while True:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
             try:
+                loop.add_signal_handler(sig, self.stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: обработчики сигналов в цикле недоступны, остаётся KeyboardInterrupt
+                pass
+
+        try:
+            await self._run_loop()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self) -> None:
+        """Закрывает пулы HTTP-соединений бота, сборщика лент и курсов, а также соединение с базой."""
+        await self.news_collector.close()
+        await self.currency_fetcher.close()
+        await self.http_request.shutdown()
+        await self.updates_request.shutdown()
+        self.database.close()
+
+    async def _sleep_until_stop(self, delay: float) -> bool:
+        """Ждёт delay секунд; возвращает True, если пришёл сигнал остановки."""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time()
+        while not self.stop_event.is_set():
+            try:
+                self._news_snapshot = None
                 now_msk = datetime.now(self.msk_tz)
                 await self._poll_admin_commands()
                 await self._run_scheduled_digests(now_msk)
@@ -1062,14 +1423,30 @@ class NewsBot:
                     await self.process_and_publish_news(breaking_only=True)
                     await self._publish_pending_breaking_digest(now_msk)
 
-                sleep_seconds = max(30, config.CHECK_INTERVAL_SECONDS)
-                await asyncio.sleep(sleep_seconds)
-            except KeyboardInterrupt:
-                logger.info("Получен сигнал остановки, завершение работы...")
-                break
+                # Срочные новости, админ-команды и неудавшаяся публикация по расписанию (повтор)
+                # требуют периодического опроса: спим до следующего дедлайна, а не на полный интервал
+                # после обработки, чтобы период не «уплывал».
+                # Иначе просыпаемся только к ближайшему событию по расписанию.
+                now = loop.time()
+                now_msk = datetime.now(self.msk_tz)
+                if config.ENABLE_BREAKING_NEWS or config.ADMIN_CHAT_ID or self._has_overdue_event(now_msk):
+                    interval = max(30, config.CHECK_INTERVAL_SECONDS)
+                    while next_deadline <= now:
+                        next_deadline += interval
+                    wake_at = next_deadline
+                else:
+                    wake_at = now + _IDLE_MAX_SLEEP_SECONDS
+                seconds_to_event = (self._next_scheduled_event(now_msk) - now_msk).total_seconds()
+                wake_at = min(wake_at, now + max(seconds_to_event, 1))
+                if await self._sleep_until_stop(wake_at - now):
+                    break
             except Exception as e:
                 logger.error("Ошибка в основном цикле: %s", e, exc_info=True)
-                await asyncio.sleep(60)
+                if await self._sleep_until_stop(60):
+                    break
+                next_deadline = loop.time()
+
+        logger.info("Получен сигнал остановки, завершение работы...")
 
 
 def main():
@@ -1083,8 +1460,9 @@ def main():
 
     news_bot = NewsBot()
 
+    run = uvloop.run if uvloop is not None else asyncio.run
     try:
-        asyncio.run(news_bot.run_continuously())
+        run(news_bot.run_continuously())
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
 
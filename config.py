@@ -79,6 +79,9 @@ DEBUG_PRIORITY_LOGGING = _env_bool('DEBUG_PRIORITY_LOGGING', False)
 # Максимальная динамическая поправка порога срочности при высоком/низком потоке
 BREAKING_DYNAMIC_THRESHOLD_DELTA = _env_float('BREAKING_DYNAMIC_THRESHOLD_DELTA', 1.0)
 
+# Лимит Telegram на сообщения в канал в минуту (вместо фиксированной паузы между постами)
+CHANNEL_MAX_MESSAGES_PER_MINUTE = _env_int('CHANNEL_MAX_MESSAGES_PER_MINUTE', 20)
+
 # Настройки повторов запросов к RSS
 RSS_FETCH_RETRY_ATTEMPTS = _env_int('RSS_FETCH_RETRY_ATTEMPTS', 3)
 RSS_FETCH_RETRY_BACKOFF_SECONDS = _env_float('RSS_FETCH_RETRY_BACKOFF_SECONDS', 1.5)
@@ -116,6 +119,9 @@ NEWS_CHECK_BATCH = 20
 # Сколько приоритетных постов публиковать за один цикл
 MAX_POSTS_PER_PUBLISH_CYCLE = 3
 
+# Сколько секунд держать в памяти недавние новости по категориям для поиска связанных постов
+RECENT_NEWS_CACHE_TTL_SECONDS = _env_int('RECENT_NEWS_CACHE_TTL_SECONDS', 300)
+
 # Период полураспада новизны (в часах) для скоринга важности
 PRIORITY_RECENCY_HALF_LIFE_HOURS = 12
 
@@ -133,18 +139,18 @@ SOURCE_RELIABILITY_WEIGHTS = {
 }
 
 # Маркеры высокой важности
-HIGH_IMPORTANCE_KEYWORDS = [
+HIGH_IMPORTANCE_KEYWORDS = (
     'экстр', 'срочно', 'санкц', 'закон принят', 'подписал закон', 'указ',
     'чрезвычайное положение', 'эвакуац', 'мобилизац', 'перемир', 'ceasefire',
     'взят в плен', 'наступлен', 'обстрел', 'ракетн удар', 'теракт'
-]
+)
 
 # Маркеры средней важности
-MEDIUM_IMPORTANCE_KEYWORDS = [
+MEDIUM_IMPORTANCE_KEYWORDS = (
     'переговор', 'саммит', 'встреч', 'заявил', 'сообщил', 'договор',
     'инфляц', 'ставк', 'рынок', 'бюджет', 'прогноз', 'реформ', 'голосован',
     'выбор', 'декрет', 'резолюц'
-]
+)
 
 # Базовый приоритет по теме
 TOPIC_BASE_PRIORITY = {
@@ -157,6 +163,9 @@ TOPIC_BASE_PRIORITY = {
 # База данных для хранения опубликованных новостей
 DATABASE_PATH = 'news_bot.db'
 
+# Файл с последними полученными курсами: после перезапуска бот не ждёт холодного запроса к API
+CURRENCY_CACHE_PATH = 'currency_rates_cache.json'
+
 # Дней хранения истории опубликованных новостей в базе
 # После этого срока старые записи автоматически удаляются (экономия места)
 DAYS_TO_KEEP_HISTORY = 30
@@ -186,7 +195,7 @@ CATEGORIES = [
 ]
 
 # Ключевые слова, указывающие на новости о вооружённых конфликтах
-ARMED_CONFLICT_KEYWORDS = [
+ARMED_CONFLICT_KEYWORDS = (
     'войн', 'боев', 'боестолкнов', 'боевые действия', 'фронт', 'линия фронта',
     'обстрел', 'ракетн', 'бпла', 'дрон', 'удар', 'контрнаступ', 'наступлен',
     'артиллери', 'авиаудар', 'всу', 'вс рф', 'минобороны', 'генштаб',
@@ -194,90 +203,90 @@ ARMED_CONFLICT_KEYWORDS = [
     'военн', 'конфликт', 'ceasefire', 'frontline', 'shelling', 'missile',
     'drone strike', 'military operation', 'armed clash', 'idf', 'hamas',
     'хусит', 'йемен', 'газ', 'сектор газа', 'сирия'
-]
+)
 
 # Ключевые слова для определения региона
-WORLD_KEYWORDS = [
+WORLD_KEYWORDS = (
     'мир', 'международн', 'оон', 'нато', 'евросоюз', 'ес', 'g7', 'g20',
     'foreign', 'international', 'diplomat', 'summit', 'united nations',
     'сша', 'украин', 'китай', 'герман', 'франц', 'британи', 'япони', 'польша',
     'израил', 'иран', 'турци', 'ближн', 'африк', 'латиноамерик', 'европ',
     'макрон', 'мерц', 'трамп', 'байден'
-]
+)
 
-RUSSIA_KEYWORDS = [
+RUSSIA_KEYWORDS = (
     'росси', 'рф', 'москва', 'московск', 'кремл', 'правительств', 'госдума',
     'совфед', 'реги', 'област', 'край', 'республик', 'губернатор', 'президент',
     'премьер', 'кабинет', 'нацпроект', 'федеральн', 'минфин', 'минэконом',
     'минздрав', 'минобр', 'минтранс'
-]
+)
 
 # Экономические маркеры (строгая рубрика «Экономическая ситуация • РФ»)
-ECONOMY_KEYWORDS = [
+ECONOMY_KEYWORDS = (
     'эконом', 'инфляц', 'валют', 'рубл', 'курс', 'бюджет', 'финанс', 'рынок',
     'акци', 'бирж', 'инвест', 'бан', 'кредит', 'ставк', 'налог', 'ввп', 'рост',
     'промышлен', 'экспорт', 'импорт', 'энергет', 'нефт', 'газ', 'тариф',
     'субсид', 'санкц', 'производ', 'логист', 'зарплат', 'потребител',
     'рознич', 'спрос', 'доход', 'реальн доход', 'безработиц'
-]
+)
 
 # Явно неэкономические социальные темы, которые нельзя относить к экономике
-NON_ECONOMIC_SOCIAL_KEYWORDS = [
+NON_ECONOMIC_SOCIAL_KEYWORDS = (
     'учител', 'педагог', 'школ', 'образован', 'студент', 'вуз', 'больниц',
     'поликлиник', 'медицин', 'социальн', 'льгот', 'пенсионер', 'демограф',
     'культур', 'театр', 'музы', 'кино', 'выставк'
-]
+)
 
 # Политические маркеры
-POLITICS_KEYWORDS = [
+POLITICS_KEYWORDS = (
     'президент', 'премьер', 'правительств', 'госдум', 'совфед', 'закон',
     'парламент', 'выбор', 'дипломат', 'санкц', 'переговор', 'саммит',
     'мид', 'кремл', 'ес', 'нато', 'оон', 'макрон', 'трамп', 'байден'
-]
+)
 
 # Общественные (неэкономические) маркеры
-SOCIETY_KEYWORDS = [
+SOCIETY_KEYWORDS = (
     'учител', 'педагог', 'школ', 'образован', 'студент', 'вуз', 'социальн',
     'здравоохран', 'медици', 'семья', 'дет', 'волонтер', 'пособи', 'пенси',
     'экологи', 'культур', 'обществен'
-]
+)
 
 
 # Ключевые слова, которые дают «ложный конфликтный шум»
-NON_CONFLICT_NOISE_KEYWORDS = [
+NON_CONFLICT_NOISE_KEYWORDS = (
     'спорт', 'культур', 'шоу', 'кино', 'музы', 'погода', 'лайфхак', 'гороскоп',
     'автомобил', 'смартфон', 'блогер', 'шоу-бизнес', 'сериал', 'туризм'
-]
+)
 
 # Топики, которые нужно исключить для источников РФ (спорт, культура, наука, происшествия)
-EXCLUDED_RUSSIAN_TOPICS_KEYWORDS = [
+EXCLUDED_RUSSIAN_TOPICS_KEYWORDS = (
     'спорт', 'футбол', 'хокке', 'матч', 'лига', 'кубок', 'чемпион',
     'культур', 'театр', 'музы', 'кино', 'фильм', 'выставк', 'литератур',
     'наук', 'учен', 'исследован', 'лаборатор', 'космос',
     'происшеств', 'чп', 'дтп', 'пожар', 'авари', 'катастроф', 'взрыв'
-]
+)
 
-EXCLUDED_RUSSIAN_SOURCES = {
+EXCLUDED_RUSSIAN_SOURCES = frozenset({
     'ТАСС Россия',
     'ТАСС Экономика',
     'РБК Россия',
     'РБК Экономика'
-}
+})
 
 # Ключевые слова для отсева локальной криминальной хроники
-LOCAL_NOISE_CRIME_KEYWORDS = [
+LOCAL_NOISE_CRIME_KEYWORDS = (
     'пья', 'пьян', 'алкогол', 'дебош', 'мелк', 'карманн', 'краж', 'вор', 'граб',
     'хулиган', 'свалил', 'угнал велосипед', 'украл велосипед'
-]
+)
 
 # Маркеры локальных новостей уровня района/города
-LOCAL_NEWS_MARKERS = [
+LOCAL_NEWS_MARKERS = (
     'в районе', 'на улице', 'местный житель', 'житель ', 'в городе', 'в посёлке', 'в поселке',
     'по области', 'районный', 'городской суд', 'в администрации города'
-]
+)
 
 # Признаки «новостей-затычек» (малополезные/пустые материалы)
-LOW_VALUE_NEWS_PATTERNS = [
+LOW_VALUE_NEWS_PATTERNS = (
     'без подробностей',
     'детали уточняются',
     'следите за обновлениями',
@@ -287,22 +296,22 @@ LOW_VALUE_NEWS_PATTERNS = [
     'срочно',
     'видео',
     'фото'
-]
+)
 
 # Минимальная длина осмысленного описания новости
 MIN_DESCRIPTION_LENGTH = 80
 
 # Общие криминальные маркеры (фильтруем по умолчанию)
-CRIME_CONTENT_KEYWORDS = [
+CRIME_CONTENT_KEYWORDS = (
     'убил', 'убий', 'зарезал', 'расстрел', 'стрельб', 'нападен', 'ограб', 'граб', 'краж',
     'вор', 'изнасил', 'мошенн', 'преступ', 'задержан', 'арестован', 'суд приговорил',
     'полиция', 'прокуратур', 'свoдка', 'поножовщина', 'драка', 'разбой', 'хулиган'
-]
+)
 
 # Исключения: криминальные события глобального масштаба/террор, которые публикуем
-ALLOWED_GLOBAL_CRIME_KEYWORDS = [
+ALLOWED_GLOBAL_CRIME_KEYWORDS = (
     'теракт', 'террорист', 'terror', 'isis', 'игил', 'аль-каида',
     'массовая стрельба', 'вооруженное нападение', 'чрезвычайное положение',
     'санкции', 'международн', 'оон', 'евросоюз', 'нато', 'глобальн',
     'энергетическ', 'кибератак', 'инфраструктур', 'авиасообщени', 'границ'
-]
+)
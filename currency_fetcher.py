@@ -1,54 +1,254 @@
 """Модуль для получения актуальных курсов валют и криптовалют с fallback-источниками."""
 
+import asyncio
+import json
 import logging
+import random
+import os
+import time
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
 
 import aiohttp
 
+try:
+    import orjson  # быстрый разбор JSON; без него работает стандартный json
+except ImportError:
+    orjson = None
+
+try:
+    import aiodns  # асинхронный DNS (c-ares) без пула потоков; на Windows не ставим
+except ImportError:
+    aiodns = None
+
 logger = logging.getLogger(__name__)
 
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Сколько секунд курсы считаются свежими и сколько их можно отдавать при сбое источников
+_RATES_CACHE_TTL_SECONDS = 120
+_RATES_STALE_MAX_AGE_SECONDS = 3600
+
+# Попытки запроса к API при временных сбоях (таймаут, обрыв соединения, 429, 5xx) и база паузы между ними
+_FETCH_ATTEMPTS = 2
+_FETCH_BACKOFF_SECONDS = 0.2
+
+# Ключи результата и коды валют в ежедневной выгрузке ЦБ
+_CBR_WANTED_CODES = (("usd_rub", "USD"), ("eur_rub", "EUR"), ("cny_rub", "CNY"))
+
+
+def _cbr_rub_per_unit(item: Optional[Dict]) -> Optional[float]:
+    """Курс ЦБ в рублях за одну единицу валюты (с учётом номинала)."""
+    # Value в выгрузке ЦБ уже число, Nominal — целое; деление само даёт float
+    value = item.get("Value") if item else None
+    return value / (item.get("Nominal") or 1) if value else None
+
+
+class _CircuitBreaker:
+    """
+    Предохранитель для одного API: после нескольких сбоев подряд запросы к нему
+    какое-то время не делаются, затем пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probe_in_flight or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        """Пробный запрос прерван, не дав ответа: следующий вызов сможет попробовать снова."""
+        self.probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Учитывает сбой; возвращает True, если предохранитель только что сработал."""
+        was_open = self.opened_at is not None and not self.probe_in_flight
+        self.probe_in_flight = False
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            return not was_open
+        return False
+
 
 class CurrencyFetcher:
     """Получает курсы USD/EUR/CNY, индекс рубля и BTC."""
 
-    def __init__(self):
-        self.timeout = aiohttp.ClientTimeout(total=10)
+    def __init__(self, cache_path: Optional[str] = None):
+        # Отдельные лимиты на соединение и чтение, чтобы зависшее чтение не съедало весь бюджет
+        self.timeout = aiohttp.ClientTimeout(total=10, connect=3, sock_read=8)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Валидаторы и разобранный ответ по каждому запросу: (url, params) -> (ETag, Last-Modified, данные)
+        self._http_cache: Dict[Tuple[str, Tuple], Tuple[Optional[str], Optional[str], Any]] = {}
+        # Последний полный набор курсов и time.monotonic() его получения
+        self._rates_cache: Optional[Dict] = None
+        self._rates_cache_at = 0.0
+        # Курсы переживают перезапуск: читаем их с диска, если они не старше допустимого «устаревания»
+        self.cache_path = cache_path
+        self._load_rates_from_disk()
+        # Идущий сейчас запрос курсов: одновременные вызовы ждут его результат, а не запускают свой
+        self._rates_inflight: Optional[asyncio.Future] = None
+        # Предохранители по хостам API: недоступный источник не тратит таймаут на каждый вызов
+        self._breakers: Dict[str, _CircuitBreaker] = {}
+        # Через сколько секунд без ответа основного источника параллельно запрашиваем запасной
+        self.hedge_after = 1.0
 
-    async def _fetch_json(self, session: aiohttp.ClientSession, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+    def _load_rates_from_disk(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
         try:
-            async with session.get(url, params=params, timeout=self.timeout) as response:
-                if response.status != 200:
-                    logger.warning("Не удалось получить данные (%s): HTTP %s", url, response.status)
-                    return None
-                return await response.json()
-        except Exception as exc:
-            logger.warning("Ошибка API (%s): %s", url, exc)
+            with open(self.cache_path, "rb") as cache_file:
+                payload = _json_loads(cache_file.read())
+            age = time.time() - float(payload["saved_at"])
+            if not 0 <= age < _RATES_STALE_MAX_AGE_SECONDS:
+                return
+            rates = dict(payload["rates"])
+            rates["timestamp"] = datetime.fromisoformat(rates["timestamp"])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Не удалось прочитать кеш курсов %s: %s", self.cache_path, exc)
+            return
+        self._rates_cache = rates
+        # Возраст переносим на монотонные часы: TTL и срок «устаревания» считаются как обычно
+        self._rates_cache_at = time.monotonic() - age
+
+    def _save_rates_to_disk(self, rates: Dict) -> None:
+        payload = {"saved_at": time.time(), "rates": rates}
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(payload, cache_file, default=datetime.isoformat)
+            # Замена атомарна: при сбое посреди записи на диске остаётся прежний файл
+            os.replace(tmp_path, self.cache_path)
+        except OSError as exc:
+            logger.warning("Не удалось сохранить кеш курсов %s: %s", self.cache_path, exc)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Одна HTTP-сессия на всё время работы: соединения, DNS и TLS переиспользуются."""
+        if self._session is None or self._session.closed:
+            resolver = aiohttp.AsyncResolver() if aiodns is not None else aiohttp.ThreadedResolver()
+            self._session = aiohttp.ClientSession(
+                # Хостов всего четыре, и к каждому не больше двух запросов сразу (основной + повтор);
+                # keep-alive держим дольше интервала между проверками курсов
+                connector=aiohttp.TCPConnector(
+                    resolver=resolver,
+                    limit=8,
+                    limit_per_host=2,
+                    keepalive_timeout=60,
+                    enable_cleanup_closed=True,
+                    use_dns_cache=True,
+                    ttl_dns_cache=300,
+                ),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _record_failure(self, host: str, breaker: _CircuitBreaker) -> None:
+        if breaker.record_failure():
+            logger.warning("API %s недоступен, пропускаем запросы к нему %.0f с", host, breaker.reset_timeout)
+
+    async def _fetch_json(self, session: aiohttp.ClientSession, url: str, params: Optional[Dict] = None) -> Optional[Any]:
+        host = urlparse(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = _CircuitBreaker()
+        if not breaker.allow_request():
             return None
 
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = self._http_cache.get(cache_key)
+        # Условный запрос: если данные не менялись, сервер ответит 304 без тела
+        headers = {}
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        for attempt in range(1, _FETCH_ATTEMPTS + 1):
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        breaker.record_success()
+                        return cached[2]
+                    if response.status != 200:
+                        logger.warning(
+                            "Не удалось получить данные (%s): HTTP %s (попытка %s/%s)",
+                            url,
+                            response.status,
+                            attempt,
+                            _FETCH_ATTEMPTS,
+                        )
+                        # Повторяем и считаем сбоем API только перегрузку и ошибки сервера;
+                        # прочие 4xx — ошибка самого запроса, хост при этом жив
+                        if response.status != 429 and response.status < 500:
+                            breaker.record_success()
+                            return None
+                    else:
+                        # Разбираем сырые байты: без промежуточного декодирования в str и без проверки
+                        # Content-Type (ЦБ отдаёт JSON с типом application/javascript)
+                        data = _json_loads(await response.read())
+                        etag = response.headers.get("ETag")
+                        last_modified = response.headers.get("Last-Modified")
+                        if etag or last_modified:
+                            self._http_cache[cache_key] = (etag, last_modified, data)
+                        breaker.record_success()
+                        return data
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                raise
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as exc:
+                logger.warning("Ошибка API (%s, попытка %s/%s): %s", url, attempt, _FETCH_ATTEMPTS, exc)
+            except ValueError as exc:
+                # orjson.JSONDecodeError и json.JSONDecodeError — наследники ValueError
+                logger.warning("Некорректный JSON от API (%s): %s", url, exc)
+                self._record_failure(host, breaker)
+                return None
+            except Exception as exc:
+                # Ошибки разбора и прочие неожиданные ошибки не повторяем
+                logger.warning("Ошибка API (%s): %s", url, exc)
+                self._record_failure(host, breaker)
+                return None
+
+            if attempt < _FETCH_ATTEMPTS:
+                # Экспоненциальная пауза с полным джиттером
+                await asyncio.sleep(random.uniform(0, _FETCH_BACKOFF_SECONDS * 2 ** attempt))
+
+        self._record_failure(host, breaker)
+        return None
+
     async def _fetch_cbr_rates(self, session: aiohttp.ClientSession) -> Dict[str, Optional[float]]:
         data = await self._fetch_json(session, "https://www.cbr-xml-daily.ru/daily_json.js")
         if not data:
             return {}
 
         valute = data.get("Valute", {})
-
-        def rub_per_unit(code: str) -> Optional[float]:
-            item = valute.get(code)
-            if not item:
-                return None
-            value = item.get("Value")
-            nominal = item.get("Nominal") or 1
-            if not value:
-                return None
-            return float(value) / float(nominal)
-
-        return {
-            "usd_rub": rub_per_unit("USD"),
-            "eur_rub": rub_per_unit("EUR"),
-            "cny_rub": rub_per_unit("CNY"),
-            "source_fiat": "CBR",
+        # Из ~40 валют ЦБ нужны только три — берём их прямым обращением по коду
+        rates: Dict[str, Optional[float]] = {
+            key: _cbr_rub_per_unit(valute.get(code)) for key, code in _CBR_WANTED_CODES
         }
+        rates["source_fiat"] = "CBR"
+        return rates
 
     async def _fetch_fiat_fallback(self, session: aiohttp.ClientSession) -> Dict[str, Optional[float]]:
         data = await self._fetch_json(
@@ -65,8 +265,10 @@ class CurrencyFetcher:
             return {}
 
         # Из базы USD получаем RUB для USD/EUR/CNY
-        eur_rub = usd_rub / rates.get("EUR") if rates.get("EUR") else None
-        cny_rub = usd_rub / rates.get("CNY") if rates.get("CNY") else None
+        usd_eur = rates.get("EUR")
+        usd_cny = rates.get("CNY")
+        eur_rub = usd_rub / usd_eur if usd_eur else None
+        cny_rub = usd_rub / usd_cny if usd_cny else None
         return {
             "usd_rub": float(usd_rub),
             "eur_rub": float(eur_rub) if eur_rub else None,
@@ -78,46 +280,112 @@ class CurrencyFetcher:
         data = await self._fetch_json(
             session,
             "https://api.coingecko.com/api/v3/simple/price",
-            {"ids": "bitcoin", "vs_currencies": "usd,rub"}
+            {"ids": "bitcoin", "vs_currencies": "usd"}
         )
-        btc = (data or {}).get("bitcoin", {})
+        btc_usd = (data or {}).get("bitcoin", {}).get("usd")
         return {
-            "btc_usd": btc.get("usd"),
-            "btc_rub": btc.get("rub"),
-            "source_btc": "CoinGecko" if btc else None,
+            "btc_usd": btc_usd,
+            "source_btc": "CoinGecko" if btc_usd else None,
         }
 
     async def _fetch_btc_binance(self, session: aiohttp.ClientSession) -> Dict[str, Optional[float]]:
-        usd = await self._fetch_json(session, "https://api.binance.com/api/v3/ticker/price", {"symbol": "BTCUSDT"})
-        rub = await self._fetch_json(session, "https://api.binance.com/api/v3/ticker/price", {"symbol": "BTCRUB"})
-        btc_usd = float(usd["price"]) if usd and usd.get("price") else None
-        btc_rub = float(rub["price"]) if rub and rub.get("price") else None
+        ticker = await self._fetch_json(session, "https://api.binance.com/api/v3/ticker/price", {"symbol": "BTCUSDT"})
+        btc_usd = float(ticker["price"]) if ticker and ticker.get("price") else None
         return {
             "btc_usd": btc_usd,
-            "btc_rub": btc_rub,
-            "source_btc": "Binance" if (btc_usd or btc_rub) else None,
+            "source_btc": "Binance" if btc_usd else None,
         }
 
+    async def _hedged(
+        self,
+        primary: Awaitable[Dict],
+        fallback: Callable[[], Awaitable[Dict]],
+        result_key: str,
+    ) -> Dict:
+        """
+        Запрос к основному источнику с «подстраховкой»: если он не ответил за hedge_after секунд,
+        параллельно запускается запасной, и берётся первый ответ, в котором есть result_key.
+        """
+        primary_task = asyncio.ensure_future(primary)
+        done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_after)
+        if done:
+            result = primary_task.result() if not primary_task.exception() else {}
+            return result if result.get(result_key) else await fallback()
+
+        pending = {primary_task, asyncio.ensure_future(fallback())}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Если оба ответили одновременно, предпочитаем основной источник
+                for task in sorted(done, key=lambda task: task is not primary_task):
+                    result = task.result() if not task.exception() else {}
+                    if result.get(result_key):
+                        return result
+            return {}
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _fetch_fiat(self, session: aiohttp.ClientSession) -> Dict[str, Optional[float]]:
+        return await self._hedged(
+            self._fetch_cbr_rates(session),
+            lambda: self._fetch_fiat_fallback(session),
+            "usd_rub",
+        )
+
+    async def _fetch_btc(self, session: aiohttp.ClientSession) -> Dict[str, Optional[float]]:
+        return await self._hedged(
+            self._fetch_btc_coingecko(session),
+            lambda: self._fetch_btc_binance(session),
+            "btc_usd",
+        )
+
     async def fetch_rates(self) -> Optional[Dict]:
-        async with aiohttp.ClientSession() as session:
-            fiat = await self._fetch_cbr_rates(session)
-            if not fiat.get("usd_rub"):
-                fiat = await self._fetch_fiat_fallback(session)
-
-            btc = await self._fetch_btc_coingecko(session)
-            if not btc.get("btc_usd") or not btc.get("btc_rub"):
-                fallback_btc = await self._fetch_btc_binance(session)
-                btc = {
-                    "btc_usd": btc.get("btc_usd") or fallback_btc.get("btc_usd"),
-                    "btc_rub": btc.get("btc_rub") or fallback_btc.get("btc_rub"),
-                    "source_btc": btc.get("source_btc") or fallback_btc.get("source_btc"),
-                }
+        if self._rates_cache and time.monotonic() - self._rates_cache_at < _RATES_CACHE_TTL_SECONDS:
+            return dict(self._rates_cache)
+
+        if self._rates_inflight is None or self._rates_inflight.done():
+            self._rates_inflight = asyncio.ensure_future(self._refresh_rates())
+        # shield: отмена одного из ожидающих не прерывает общий запрос для остальных
+        rates = await asyncio.shield(self._rates_inflight)
+        return dict(rates) if rates else None
+
+    async def _refresh_rates(self) -> Optional[Dict]:
+        rates = await self._fetch_rates_uncached()
+        if rates:
+            self._rates_cache = rates
+            self._rates_cache_at = time.monotonic()
+            if self.cache_path:
+                await asyncio.to_thread(self._save_rates_to_disk, rates)
+            return rates
+
+        if self._rates_cache and time.monotonic() - self._rates_cache_at < _RATES_STALE_MAX_AGE_SECONDS:
+            logger.warning("Источники курсов недоступны, используем последние полученные курсы")
+            return self._rates_cache
+        return None
+
+    async def _fetch_rates_uncached(self) -> Optional[Dict]:
+        session = await self._get_session()
+        # Фиатные курсы и BTC независимы — запрашиваем их одновременно
+        fiat, btc = await asyncio.gather(
+            self._fetch_fiat(session),
+            self._fetch_btc(session),
+            return_exceptions=True,
+        )
+
+        if isinstance(fiat, Exception):
+            logger.warning("Ошибка получения фиатных курсов: %s", fiat)
+            fiat = {}
+        if isinstance(btc, Exception):
+            logger.warning("Ошибка получения курса BTC: %s", btc)
+            btc = {}
 
         usd_rub = fiat.get("usd_rub")
         eur_rub = fiat.get("eur_rub")
         cny_rub = fiat.get("cny_rub")
         btc_usd = btc.get("btc_usd")
-        btc_rub = btc.get("btc_rub")
+        # BTC/RUB считаем через USD/RUB: на один запрос меньше и без неликвидной пары BTCRUB
+        btc_rub = btc_usd * usd_rub if btc_usd and usd_rub else None
 
         if not (usd_rub and eur_rub and cny_rub and btc_usd and btc_rub):
             logger.error("Не удалось получить полный набор курсов")
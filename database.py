@@ -4,11 +4,202 @@
 """
 
 import sqlite3
-import hashlib
+import calendar
 import re
 import json
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict
+from functools import lru_cache
+from typing import Iterator, Optional, List, Dict
+
+import xxhash
+
+
+# Текущая версия схемы базы (PRAGMA user_version); миграции — в NewsDatabase._migrate
+_SCHEMA_VERSION = 3
+
+# Окна поиска дубликатов: тот же URL — за 30 дней, похожий заголовок — за 7 дней
+_URL_DUPLICATE_WINDOW_SECONDS = 30 * 24 * 3600
+_TITLE_DUPLICATE_WINDOW_SECONDS = 7 * 24 * 3600
+
+
+def _unix_seconds(value: datetime) -> int:
+    """
+    Время публикации в секундах Unix. Дата без часового пояса считается UTC —
+    так же, как её понимают функции даты SQLite.
+    """
+    return calendar.timegm(value.utctimetuple())
+
+
+def _cutoff(window_seconds: int) -> int:
+    """Граница окна «последние window_seconds секунд» для сравнения с published_at_ts."""
+    return int(time.time()) - window_seconds
+
+
+# Параметры запроса и фрагмент при сравнении URL не учитываются: отрезаем всё с первого «?» или «#»
+_URL_QUERY_OR_FRAGMENT_RE = re.compile(r'[?#]')
+
+# Знаки препинания и спецсимволы (всё, кроме букв, цифр и пробелов) и серии пробельных символов
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=8192)
+def _normalize_url(url: str) -> str:
+    """Нормализация URL (чистая функция, поэтому результат кешируется)."""
+    if not url:
+        return ""
+
+    # Нижний регистр, без параметров запроса, фрагмента и завершающего слэша
+    normalized = _URL_QUERY_OR_FRAGMENT_RE.split(url.lower().strip(), 1)[0]
+    return normalized.rstrip('/')
+
+
+@lru_cache(maxsize=8192)
+def _normalize_title(title: str) -> str:
+    """
+    Нормализация заголовка (чистая функция, поэтому результат кешируется: заголовки-кандидаты
+    из окна дубликатов повторяются от проверки к проверке).
+    """
+    # Приводим к нижнему регистру
+    normalized = title.lower().strip()
+
+    # Удаляем знаки препинания и специальные символы
+    normalized = _PUNCTUATION_RE.sub('', normalized)
+
+    # Удаляем множественные пробелы
+    normalized = _WHITESPACE_RE.sub(' ', normalized)
+
+    return normalized.strip()
+
+
+# Порог расстояния Хэмминга между SimHash заголовков, после которого пару не сравниваем посимвольно.
+# Одна опечатка в коротком заголовке меняет несколько триграмм, поэтому порог чуть выше обычных 3
+_SIMHASH_MAX_HAMMING = 6
+
+# Числа в заголовке: заголовки, отличающиеся только числом (ставка, курс, число жертв), — разные новости
+_NUMBER_RE = re.compile(r'\d+')
+
+# Сколько правок допускаем в каждом отличающемся слове заголовка, чтобы считать его опечаткой.
+# Две правки уже меняют смысл: «заблокировала» → «разблокировала», «повысил» → «понизил»
+_TYPO_MAX_WORD_DISTANCE = 1
+
+# Запись новости; уже сохранённая (тот же news_hash) пропускается без исключения IntegrityError
+_INSERT_NEWS_SQL = '''
+    INSERT OR IGNORE INTO news (news_hash, title, source, url, normalized_url, category, content_hash,
+                                published_at, published_at_ts, normalized_title)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# То же с RETURNING (SQLite 3.35+): пустое обновление при конфликте заставляет вернуть id уже
+# существующей записи, так что id получаем тем же запросом, без отдельного SELECT
+_UPSERT_NEWS_SQL = '''
+    INSERT INTO news (news_hash, title, source, url, normalized_url, category, content_hash,
+                      published_at, published_at_ts, normalized_title)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(news_hash) DO UPDATE SET news_hash = news_hash
+    RETURNING id
+'''
+_SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Сколько самых близких по BM25 заголовков из полнотекстового индекса проверяем на сходство
+_TITLE_CANDIDATES_LIMIT = 20
+
+# Предел числа запомненных результатов is_similar_title_published (при переполнении кеш очищается)
+_PUBLISHED_CACHE_MAX_SIZE = 10_000
+
+
+@lru_cache(maxsize=8192)
+def _title_simhash(normalized_title: str) -> int:
+    """64-битный SimHash нормализованного заголовка по символьным триграммам."""
+    text = f" {normalized_title} "
+    weights = [0] * 64
+    for i in range(len(text) - 2):
+        shingle_hash = xxhash.xxh3_64_intdigest(text[i:i + 3].encode('utf-8'))
+        for bit in range(64):
+            weights[bit] += 1 if (shingle_hash >> bit) & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _damerau_levenshtein(left: str, right: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау–Левенштейна (вариант OSA) с ранним выходом.
+    Если расстояние заведомо больше max_distance, возвращает max_distance + 1.
+    """
+    if abs(len(left) - len(right)) > max_distance:
+        return max_distance + 1
+
+    before_previous: List[int] = []
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        for j, right_char in enumerate(right, 1):
+            cost = 0 if left_char == right_char else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and left_char == right[j - 2] and left[i - 2] == right_char:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def _is_typo_variant(left: str, right: str) -> bool:
+    """
+    Отличаются ли нормализованные заголовки только опечатками: те же числа, то же число слов,
+    каждое отличающееся слово — в пределах одной правки, близкий SimHash и общее редакционное
+    расстояние не больше 20% длины. Вставленное «не» или другая приставка — уже другая новость.
+
+    >>> _is_typo_variant('путин провёл встречу с главой минфина', 'путин провел встречу с главой минфина')
+    True
+    >>> _is_typo_variant('минобороны подтвердило гибель военных в курской области',
+    ...                  'минобороны не подтвердило гибель военных в курской области')
+    False
+    >>> _is_typo_variant('венгрия заблокировала новый пакет санкций ес',
+    ...                  'венгрия разблокировала новый пакет санкций ес')
+    False
+    >>> _is_typo_variant('цб повысил ключевую ставку до 18', 'цб повысил ключевую ставку до 19')
+    False
+    """
+    if not left or not right:
+        return False
+    if _NUMBER_RE.findall(left) != _NUMBER_RE.findall(right):
+        return False
+
+    left_words = left.split()
+    right_words = right.split()
+    if len(left_words) != len(right_words):
+        return False
+    for left_word, right_word in zip(left_words, right_words):
+        if left_word != right_word and _damerau_levenshtein(
+            left_word, right_word, _TYPO_MAX_WORD_DISTANCE
+        ) > _TYPO_MAX_WORD_DISTANCE:
+            return False
+
+    if bin(_title_simhash(left) ^ _title_simhash(right)).count('1') > _SIMHASH_MAX_HAMMING:
+        return False
+    max_distance = int(0.2 * min(len(left), len(right)))
+    return _damerau_levenshtein(left, right, max_distance) <= max_distance
+
+
+def _recent_news_dict(row: tuple) -> Dict:
+    """Строка SELECT id, title, url, source, category, published_at в виде словаря."""
+    return {
+        'id': row[0],
+        'title': row[1],
+        'url': row[2],
+        'source': row[3],
+        'category': row[4],
+        'published_at': row[5],
+    }
+
 
 class NewsDatabase:
     """
@@ -24,16 +215,111 @@ class NewsDatabase:
             db_path: Путь к файлу базы данных SQLite
         """
         self.db_path = db_path
+        # Одно соединение на всё время работы вместо открытия файла базы на каждый запрос.
+        # Базой пользуются и цикл событий, и рабочие потоки (asyncio.to_thread), поэтому доступ под блокировкой
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._configure_connection()
+        # Полнотекстовый индекс заголовков (FTS5); без него похожие заголовки ищутся перебором
+        self.fts_enabled = False
+        # Результаты is_similar_title_published до следующей записи в news: ленты отдают одни и те же
+        # новости каждый цикл, а база между публикациями не меняется
+        self._published_cache: Dict[str, bool] = {}
+        self._published_cache_generation = 0
         self.init_database()
+
+    def _configure_connection(self) -> None:
+        """
+        Режим журнала и кеш страниц. WAL: чтение не ждёт запись, а при synchronous=NORMAL
+        fsync делается на контрольной точке, а не на каждой фиксации.
+        Внешние ключи related_posts → news SQLite проверяет только при включённом foreign_keys.
+        """
+        for pragma in (
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            'PRAGMA temp_store=MEMORY',
+            'PRAGMA cache_size=-20000',
+            'PRAGMA mmap_size=268435456',
+            'PRAGMA foreign_keys=ON',
+        ):
+            self._conn.execute(pragma)
+
+    @contextmanager
+    def _cursor(self, row_factory=None) -> Iterator[sqlite3.Cursor]:
+        """Курсор общего соединения; при ошибке незафиксированные изменения откатываются."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            if row_factory is not None:
+                cursor.row_factory = row_factory
+            try:
+                yield cursor
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close(self) -> None:
+        """Обновляет статистику планировщика запросов (если она устарела) и закрывает соединение с базой."""
+        with self._lock:
+            try:
+                self._conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            self._conn.close()
     
     def init_database(self):
         """
         Создание таблиц в базе данных, если они не существуют.
         Таблица news хранит информацию о опубликованных новостях.
+        Версия схемы хранится в PRAGMA user_version: если база уже актуальна, миграции не выполняются.
+        """
+        with self._cursor() as cursor:
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            if version < _SCHEMA_VERSION:
+                self._migrate(cursor, version)
+                cursor.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+                self._conn.commit()
+
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_fts'")
+            self.fts_enabled = cursor.fetchone() is not None
+
+    def _migrate(self, cursor: sqlite3.Cursor, version: int) -> None:
+        """Последовательно обновляет схему с версии version до _SCHEMA_VERSION."""
+        if version < 1:
+            self._migrate_to_v1(cursor)
+        if version < 2:
+            # Версия 2: свежие новости категории ищутся по составному индексу сразу в нужном порядке.
+            # Одиночный индекс по category им покрывается (левый префикс), а поиск по slot_key идёт
+            # по автоматическому индексу ограничения UNIQUE
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_news_category_published_at_ts '
+                'ON news(category, published_at_ts DESC)'
+            )
+            cursor.execute('DROP INDEX IF EXISTS idx_news_category')
+            cursor.execute('DROP INDEX IF EXISTS idx_currency_slot_key')
+        if version < 3:
+            # Версия 3: нормализованный заголовок хранится в строке, и точный повтор заголовка
+            # находится по индексу, а не перебором заголовков за 7 дней в Python
+            cursor.execute("PRAGMA table_info(news)")
+            if 'normalized_title' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE news ADD COLUMN normalized_title TEXT')
+            self._conn.create_function('normalize_title', 1, _normalize_title, deterministic=True)
+            cursor.execute('UPDATE news SET normalized_title = normalize_title(title) WHERE normalized_title IS NULL')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_news_normalized_title '
+                'ON news(normalized_title, published_at_ts)'
+            )
+
+        # После изменения схемы и заполнения колонок обновляем статистику планировщика запросов
+        cursor.execute('ANALYZE')
+
+    def _migrate_to_v1(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Версия 1: таблицы, колонки normalized_url и published_at_ts, индексы, полнотекстовый индекс
+        заголовков и хеши xxh3-128. Подходит и для новой базы, и для базы без версии.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Создаем таблицу для хранения опубликованных новостей
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS news (
@@ -54,6 +340,21 @@ class NewsDatabase:
         existing_columns = {row[1] for row in cursor.fetchall()}
         if 'content_hash' not in existing_columns:
             cursor.execute('ALTER TABLE news ADD COLUMN content_hash TEXT')
+        if 'published_at_ts' not in existing_columns:
+            # Время публикации числом: фильтры по окну времени идут по индексу, а не через datetime() для каждой строки
+            cursor.execute('ALTER TABLE news ADD COLUMN published_at_ts INTEGER')
+        if 'normalized_url' not in existing_columns:
+            cursor.execute('ALTER TABLE news ADD COLUMN normalized_url TEXT')
+
+        # Заполнение новых колонок — без условия: ALTER TABLE фиксируется сразу, и если прошлый запуск
+        # прервался до UPDATE, пустые значения дозаполнятся сейчас
+        cursor.execute(
+            "UPDATE news SET published_at_ts = CAST(strftime('%s', published_at) AS INTEGER) "
+            "WHERE published_at_ts IS NULL"
+        )
+        # Для старых записей — та же функция нормализации, что и в Python
+        self._conn.create_function('normalize_url', 1, _normalize_url, deterministic=True)
+        cursor.execute('UPDATE news SET normalized_url = normalize_url(url) WHERE normalized_url IS NULL')
         
         # Создаем таблицу для хранения связанных постов (для дополняющих постов)
         cursor.execute('''
@@ -87,9 +388,57 @@ class NewsDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_category ON news(category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_url ON news(url)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_content_hash ON news(content_hash)')
-        
-        conn.commit()
-        conn.close()
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_normalized_url ON news(normalized_url)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_published_at_ts ON news(published_at_ts)')
+
+        # Хеши новостей и курсов — xxh3-128 вместо MD5. Пересчитываем их по сохранённым полям,
+        # иначе точная проверка по хешу не узнает новости, опубликованные до обновления
+        self._conn.create_function('news_hash', 3, self.generate_hash, deterministic=True)
+        self._conn.create_function(
+            'xxh3_128', 1, lambda text: xxhash.xxh3_128_hexdigest(text.encode('utf-8')), deterministic=True
+        )
+        cursor.execute('UPDATE news SET news_hash = news_hash(title, url, source)')
+        cursor.execute('UPDATE currency_posts SET rates_hash = xxh3_128(payload)')
+
+        self._create_title_index(cursor)
+
+    def _create_title_index(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Полнотекстовый индекс по заголовкам news (external content) и триггеры синхронизации.
+        Возвращает False, если SQLite собран без FTS5.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                    title, content='news', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news BEGIN
+                INSERT INTO news_fts(rowid, title) VALUES (new.id, new.title);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news BEGIN
+                INSERT INTO news_fts(news_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE OF title ON news BEGIN
+                INSERT INTO news_fts(news_fts, rowid, title) VALUES ('delete', old.id, old.title);
+                INSERT INTO news_fts(rowid, title) VALUES (new.id, new.title);
+            END
+        ''')
+        if not exists:
+            # Индекс создан для уже заполненной таблицы — строим его по существующим записям
+            cursor.execute("INSERT INTO news_fts(news_fts) VALUES ('rebuild')")
+        return True
     
     def generate_hash(self, title: str, url: str, source: str) -> str:
         """
@@ -102,11 +451,11 @@ class NewsDatabase:
             source: Источник новости
             
         Returns:
-            MD5 хеш строки, составленной из параметров
+            xxh3-128 хеш строки, составленной из параметров (криптостойкость здесь не нужна)
         """
         # Составляем строку для хеширования
         hash_string = f"{source}|{url}|{title.lower().strip()}"
-        return hashlib.md5(hash_string.encode('utf-8')).hexdigest()
+        return xxhash.xxh3_128_hexdigest(hash_string.encode('utf-8'))
 
     def normalize_content(self, title: str, description: str) -> str:
         """
@@ -120,8 +469,8 @@ class NewsDatabase:
             Нормализованный текст
         """
         text = f"{title} {description}".lower().strip()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
+        text = _PUNCTUATION_RE.sub(' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         return text.strip()
 
     def generate_content_hash(self, title: str, description: str) -> str:
@@ -133,10 +482,10 @@ class NewsDatabase:
             description: Описание новости
 
         Returns:
-            MD5 хеш нормализованного текста
+            xxh3-128 хеш нормализованного текста (криптостойкость здесь не нужна)
         """
         normalized = self.normalize_content(title, description)
-        return hashlib.md5(normalized.encode('utf-8')).hexdigest() if normalized else ''
+        return xxhash.xxh3_128_hexdigest(normalized.encode('utf-8')) if normalized else ''
     
     def normalize_title(self, title: str) -> str:
         """
@@ -149,16 +498,7 @@ class NewsDatabase:
         Returns:
             Нормализованный заголовок
         """
-        # Приводим к нижнему регистру
-        normalized = title.lower().strip()
-        
-        # Удаляем знаки препинания и специальные символы
-        normalized = re.sub(r'[^\w\s]', '', normalized)
-        
-        # Удаляем множественные пробелы
-        normalized = re.sub(r'\s+', ' ', normalized)
-        
-        return normalized.strip()
+        return _normalize_title(title)
     
     def normalize_url(self, url: str) -> str:
         """
@@ -171,32 +511,23 @@ class NewsDatabase:
         Returns:
             Нормализованный URL
         """
-        if not url:
-            return ""
-        
-        # Приводим к нижнему регистру
-        normalized = url.lower().strip()
-        
-        # Удаляем фрагменты (все что после #)
-        if '#' in normalized:
-            normalized = normalized.split('#')[0]
-        
-        # Удаляем параметры запроса (все что после ?), но только если это не важные параметры
-        # Некоторые сайты используют параметры для отслеживания, но URL по сути тот же
-        if '?' in normalized:
-            base_url = normalized.split('?')[0]
-            # Сохраняем только базовый URL без параметров
-            normalized = base_url
-        
-        # Удаляем завершающий слэш
-        normalized = normalized.rstrip('/')
-        
-        return normalized
+        return _normalize_url(url)
+
+    def normalize_news_url(self, news: Dict) -> str:
+        """Нормализованный URL новости; вычисляется один раз и хранится в самом словаре."""
+        normalized_url = news.get('normalized_url')
+        if normalized_url is None:
+            normalized_url = _normalize_url(news.get('url', ''))
+            news['normalized_url'] = normalized_url
+        return normalized_url
     
     def is_news_published(self, title: str, url: str, source: str, description: str = '') -> bool:
         """
         Проверяет, была ли новость уже опубликована.
         Проверяет как точное совпадение (хеш), так и похожие заголовки/URL из разных категорий.
+        Похожим считается заголовок, совпадающий после нормализации, совпадающий по словам более
+        чем на 90% или отличающийся опечатками: то же число слов и те же числа, каждое отличающееся
+        слово — в пределах одной правки, близкий SimHash и редакционное расстояние не больше 20% длины.
         
         Args:
             title: Заголовок новости
@@ -206,60 +537,68 @@ class NewsDatabase:
         Returns:
             True, если новость уже опубликована, False в противном случае
         """
-        # Сначала проверяем точное совпадение по хешу
-        news_hash = self.generate_hash(title, url, source)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id FROM news WHERE news_hash = ?', (news_hash,))
-        result = cursor.fetchone()
-        
-        if result:
-            conn.close()
-            return True
-        
-        # ВАЖНО: Проверяем URL независимо от категории и источника
-        # Если тот же URL уже был опубликован, это дубликат
-        normalized_url = self.normalize_url(url)
-        
-        if normalized_url:
-            # Получаем все URL за последние 30 дней и проверяем нормализованные версии
-            cursor.execute('''
-                SELECT url FROM news 
-                WHERE datetime(published_at) > datetime('now', '-30 days')
-            ''')
-            
-            published_urls = cursor.fetchall()
-            
-            for (published_url,) in published_urls:
-                normalized_published = self.normalize_url(published_url)
-                # Если нормализованные URL совпадают, это дубликат
-                if normalized_url and normalized_published and normalized_url == normalized_published:
-                    conn.close()
-                    return True
-        
-        # Проверяем похожий контент независимо от категории
-        content_hash = self.generate_content_hash(title, description)
-        if content_hash:
-            cursor.execute('SELECT id FROM news WHERE content_hash = ?', (content_hash,))
-            result = cursor.fetchone()
-            if result:
-                conn.close()
-                return True
+        # Точные совпадения проверяет filter_new — правила заданы в одном месте
+        item = {'title': title, 'url': url, 'source': source, 'description': description}
+        return not self.filter_new([item]) or self.is_similar_title_published(title)
+
+    def is_similar_title_published(self, title: str) -> bool:
+        """
+        Только поиск похожих заголовков из is_news_published, без точных проверок по хешам и URL.
+        Для новостей, уже прошедших filter_new: точные совпадения для них проверены пачкой.
+
+        Args:
+            title: Заголовок новости
 
-        # Проверяем похожие заголовки независимо от категории
-        # Нормализуем текущий заголовок
+        Returns:
+            True, если за последние 7 дней публиковался похожий заголовок
+        """
         normalized_title = self.normalize_title(title)
-        
-        # Получаем все опубликованные заголовки за последние 7 дней
-        cursor.execute('''
-            SELECT title FROM news 
-            WHERE datetime(published_at) > datetime('now', '-7 days')
-        ''')
-        
-        published_titles = cursor.fetchall()
-        conn.close()
-        
+        cached = self._published_cache.get(normalized_title)
+        if cached is not None:
+            return cached
+
+        generation = self._published_cache_generation
+        result = self._similar_title_published(normalized_title)
+        # Если пока шёл запрос, в базу что-то записали, результат мог устареть — не кешируем его
+        if generation == self._published_cache_generation:
+            if len(self._published_cache) >= _PUBLISHED_CACHE_MAX_SIZE:
+                self._published_cache.clear()
+            self._published_cache[normalized_title] = result
+        return result
+
+    def _invalidate_published_cache(self) -> None:
+        self._published_cache_generation += 1
+        self._published_cache.clear()
+
+    def _similar_title_published(self, normalized_title: str) -> bool:
+        """Есть ли за 7 дней похожий заголовок (по нормализованному заголовку новости)."""
+        with self._cursor() as cursor:
+            # Проверяем похожие заголовки независимо от категории
+            if self.fts_enabled:
+                # Кандидаты — заголовки за 7 дней с общими словами, самые близкие по BM25
+                if not normalized_title:
+                    return False
+                match_query = ' OR '.join(
+                    '"{}"'.format(word.replace('"', '""')) for word in dict.fromkeys(normalized_title.split())
+                )
+                cursor.execute('''
+                    SELECT news.title FROM news_fts
+                    JOIN news ON news.id = news_fts.rowid
+                    WHERE news_fts MATCH ? AND news.published_at_ts > ?
+                    ORDER BY bm25(news_fts)
+                    LIMIT ?
+                ''', (match_query, _cutoff(_TITLE_DUPLICATE_WINDOW_SECONDS), _TITLE_CANDIDATES_LIMIT))
+            else:
+                # Получаем все опубликованные заголовки за последние 7 дней
+                cursor.execute('''
+                    SELECT title FROM news 
+                    WHERE published_at_ts > ?
+                ''', (_cutoff(_TITLE_DUPLICATE_WINDOW_SECONDS),))
+            
+            published_titles = cursor.fetchall()
+
+        current_words = set(normalized_title.split())
+
         # Проверяем, есть ли похожий заголовок
         for (published_title,) in published_titles:
             normalized_published = self.normalize_title(published_title)
@@ -270,7 +609,6 @@ class NewsDatabase:
             
             # Дополнительная проверка: если заголовки очень похожи (более 90% совпадения)
             # Используем простое сравнение по словам
-            current_words = set(normalized_title.split())
             published_words = set(normalized_published.split())
             
             if len(current_words) > 0 and len(published_words) > 0:
@@ -281,9 +619,66 @@ class NewsDatabase:
                 # Если совпадение более 90%, считаем это дубликатом
                 if similarity > 0.9:
                     return True
+
+            # Опечатки и варианты написания
+            if _is_typo_variant(normalized_title, normalized_published):
+                return True
         
         return False
-    
+
+    def filter_new(self, items: List[Dict]) -> List[Dict]:
+        """
+        Отсеивает из пачки новости, у которых в базе есть точное совпадение: тот же хеш,
+        тот же нормализованный URL за 30 дней, тот же контент или тот же нормализованный заголовок
+        за 7 дней — одним запросом на всю пачку через временную таблицу.
+
+        Args:
+            items: Список словарей с полями title, url, source и (опционально) description
+
+        Returns:
+            Новости без точных совпадений в базе, в исходном порядке
+        """
+        if not items:
+            return []
+
+        rows = []
+        for position, item in enumerate(items):
+            rows.append((
+                position,
+                self.generate_hash(item['title'], item['url'], item['source']),
+                self.normalize_news_url(item) or None,
+                self.generate_content_hash(item['title'], item.get('description', '')) or None,
+                self.normalize_title(item['title']) or None,
+            ))
+
+        with self._cursor() as cursor:
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS candidates (
+                    position INTEGER PRIMARY KEY,
+                    news_hash TEXT,
+                    normalized_url TEXT,
+                    content_hash TEXT,
+                    normalized_title TEXT
+                )
+            ''')
+            cursor.execute('DELETE FROM candidates')
+            cursor.executemany('INSERT INTO candidates VALUES (?, ?, ?, ?, ?)', rows)
+            # Каждое условие — отдельный подзапрос, чтобы SQLite искал по своему индексу
+            cursor.execute('''
+                SELECT c.position FROM candidates c
+                WHERE EXISTS (SELECT 1 FROM news n WHERE n.news_hash = c.news_hash)
+                   OR EXISTS (SELECT 1 FROM news n WHERE n.normalized_url = c.normalized_url
+                                                     AND n.published_at_ts > ?)
+                   OR EXISTS (SELECT 1 FROM news n WHERE n.content_hash = c.content_hash)
+                   OR EXISTS (SELECT 1 FROM news n WHERE n.normalized_title = c.normalized_title
+                                                     AND n.published_at_ts > ?)
+            ''', (_cutoff(_URL_DUPLICATE_WINDOW_SECONDS), _cutoff(_TITLE_DUPLICATE_WINDOW_SECONDS)))
+            published_positions = {position for (position,) in cursor.fetchall()}
+            cursor.execute('DELETE FROM candidates')
+            self._conn.commit()
+
+        return [item for position, item in enumerate(items) if position not in published_positions]
+
     def get_categories_by_url(self, url: str) -> List[str]:
         """
         Получает все категории, под которые подходит новость с данным URL.
@@ -299,29 +694,13 @@ class NewsDatabase:
         if not normalized_url:
             return []
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Получаем все категории для похожих URL за последние 7 дней
-        cursor.execute('''
-            SELECT DISTINCT category FROM news 
-            WHERE datetime(published_at) > datetime('now', '-7 days')
-        ''')
-        
-        all_categories = [row[0] for row in cursor.fetchall()]
-        
-        # Проверяем, есть ли уже опубликованная новость с таким же URL
-        cursor.execute('''
-            SELECT DISTINCT category FROM news 
-            WHERE datetime(published_at) > datetime('now', '-30 days')
-        ''')
-        
-        published_categories = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        # Возвращаем все категории, которые могут подходить
-        return list(set(published_categories))
+        # Категории, под которыми этот URL уже публиковался за последние 30 дней
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT DISTINCT category FROM news
+                WHERE normalized_url = ? AND published_at_ts > ?
+            ''', (normalized_url, _cutoff(_URL_DUPLICATE_WINDOW_SECONDS)))
+            return [row[0] for row in cursor.fetchall()]
     
     def save_news(self, title: str, url: str, source: str, category: str, published_at: datetime,
                   description: str = '') -> int:
@@ -338,26 +717,67 @@ class NewsDatabase:
         Returns:
             ID сохраненной записи в базе данных
         """
-        news_hash = self.generate_hash(title, url, source)
-        content_hash = self.generate_content_hash(title, description)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO news (news_hash, title, source, url, category, content_hash, published_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (news_hash, title, source, url, category, content_hash, published_at))
-            news_id = cursor.lastrowid
-            conn.commit()
-            return news_id
-        except sqlite3.IntegrityError:
-            # Если новость уже существует (по хешу), возвращаем её ID
-            cursor.execute('SELECT id FROM news WHERE news_hash = ?', (news_hash,))
-            result = cursor.fetchone()
-            return result[0] if result else None
-        finally:
-            conn.close()
+        return self.save_news_bulk([{
+            'title': title,
+            'url': url,
+            'source': source,
+            'category': category,
+            'published_at': published_at,
+            'description': description,
+        }])[0]
+    
+    def save_news_bulk(self, items: List[Dict]) -> List[Optional[int]]:
+        """
+        Сохраняет несколько новостей одной транзакцией.
+
+        Args:
+            items: Список словарей с полями title, url, source, category,
+                   published_at и (опционально) description
+
+        Returns:
+            ID записей в базе данных в порядке items (для уже существующих — ID старой записи)
+        """
+        if not items:
+            return []
+
+        rows = []
+        for item in items:
+            rows.append((
+                self.generate_hash(item['title'], item['url'], item['source']),
+                item['title'],
+                item['source'],
+                item['url'],
+                self.normalize_url(item['url']),
+                item['category'],
+                self.generate_content_hash(item['title'], item.get('description', '')),
+                item['published_at'],
+                _unix_seconds(item['published_at']),
+                self.normalize_title(item['title']),
+            ))
+
+        with self._cursor() as cursor:
+            # Блокировку записи берём сразу: вся пачка — одна транзакция и один COMMIT,
+            # и вставка не упадёт с SQLITE_BUSY на полпути при повышении блокировки
+            if not self._conn.in_transaction:
+                cursor.execute('BEGIN IMMEDIATE')
+            if _SQLITE_HAS_RETURNING:
+                news_ids = [cursor.execute(_UPSERT_NEWS_SQL, row).fetchone()[0] for row in rows]
+                self._conn.commit()
+                self._invalidate_published_cache()
+                return news_ids
+
+            cursor.executemany(_INSERT_NEWS_SQL, rows)
+            self._conn.commit()
+            self._invalidate_published_cache()
+
+            news_hashes = list(dict.fromkeys(row[0] for row in rows))
+            placeholders = ', '.join('?' for _ in news_hashes)
+            cursor.execute(
+                f'SELECT news_hash, id FROM news WHERE news_hash IN ({placeholders})',
+                news_hashes
+            )
+            ids_by_hash = dict(cursor.fetchall())
+        return [ids_by_hash.get(row[0]) for row in rows]
     
     def get_recent_news_by_category(self, category: str, hours: int = 24, limit: int = 5) -> List[Dict]:
         """
@@ -371,23 +791,54 @@ class NewsDatabase:
         Returns:
             Список словарей с информацией о новостях
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Позволяет обращаться к колонкам по имени
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, title, url, source, category, published_at
-            FROM news
-            WHERE category = ? AND datetime(published_at) > datetime('now', '-' || ? || ' hours')
-            ORDER BY published_at DESC
-            LIMIT ?
-        ''', (category, hours, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
-    
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT id, title, url, source, category, published_at
+                FROM news
+                WHERE category = ? AND published_at_ts > ?
+                ORDER BY published_at_ts DESC
+                LIMIT ?
+            ''', (category, _cutoff(hours * 3600), limit))
+            
+            return [_recent_news_dict(row) for row in cursor]
+
+    def get_recent_news_by_categories(self, categories: List[str], hours: int = 24,
+                                      limit_per_category: int = 5) -> Dict[str, List[Dict]]:
+        """
+        Получает недавние новости сразу по нескольким категориям одним запросом.
+
+        Args:
+            categories: Список категорий новостей
+            hours: Количество часов для выборки
+            limit_per_category: Максимальное количество записей на категорию
+
+        Returns:
+            Словарь {категория: список новостей}, новости отсортированы от новых к старым
+        """
+        unique_categories = list(dict.fromkeys(categories))
+        result: Dict[str, List[Dict]] = {category: [] for category in unique_categories}
+        if not unique_categories:
+            return result
+
+        placeholders = ', '.join('?' for _ in unique_categories)
+        with self._cursor() as cursor:
+            cursor.execute(f'''
+                SELECT id, title, url, source, category, published_at
+                FROM (
+                    SELECT id, title, url, source, category, published_at,
+                           ROW_NUMBER() OVER (PARTITION BY category ORDER BY published_at_ts DESC) AS rn
+                    FROM news
+                    WHERE category IN ({placeholders})
+                      AND published_at_ts > ?
+                )
+                WHERE rn <= ?
+                ORDER BY category, rn
+            ''', (*unique_categories, _cutoff(hours * 3600), limit_per_category))
+
+            for row in cursor:
+                result[row[4]].append(_recent_news_dict(row))
+        return result
+
     def link_related_posts(self, original_post_id: int, related_post_id: int):
         """
         Связывает два поста как связанные (один дополняет другой).
@@ -396,53 +847,47 @@ class NewsDatabase:
             original_post_id: ID оригинального поста
             related_post_id: ID связанного поста
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR IGNORE INTO related_posts (original_post_id, related_post_id)
-            VALUES (?, ?)
-        ''', (original_post_id, related_post_id))
-        
-        conn.commit()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO related_posts (original_post_id, related_post_id)
+                VALUES (?, ?)
+            ''', (original_post_id, related_post_id))
+            
+            self._conn.commit()
     
+    def _rates_payload(self, rates: Dict) -> str:
+        # timestamp в курсах — datetime, поэтому нестандартные типы сохраняем строкой
+        return json.dumps(rates, sort_keys=True, ensure_ascii=False, default=str)
+
     def _rates_hash(self, rates: Dict) -> str:
-        payload = json.dumps(rates, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(payload.encode('utf-8')).hexdigest()
+        return xxhash.xxh3_128_hexdigest(self._rates_payload(rates).encode('utf-8'))
 
     def is_currency_post_published(self, slot_key: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM currency_posts WHERE slot_key = ?', (slot_key,))
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute('SELECT id FROM currency_posts WHERE slot_key = ?', (slot_key,))
+            result = cursor.fetchone()
         return bool(result)
 
     def save_currency_post(self, slot_key: str, rates: Dict) -> None:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        rates_hash = self._rates_hash(rates)
-        payload = json.dumps(rates, ensure_ascii=False, sort_keys=True)
-        cursor.execute("""
-            INSERT OR REPLACE INTO currency_posts (slot_key, rates_hash, payload)
-            VALUES (?, ?, ?)
-        """, (slot_key, rates_hash, payload))
-        conn.commit()
-        conn.close()
+        # Хеш считается от того же JSON, что сохраняется в payload
+        payload = self._rates_payload(rates)
+        rates_hash = xxhash.xxh3_128_hexdigest(payload.encode('utf-8'))
+        with self._cursor() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO currency_posts (slot_key, rates_hash, payload)
+                VALUES (?, ?, ?)
+            """, (slot_key, rates_hash, payload))
+            self._conn.commit()
 
     def get_last_currency_post(self) -> Optional[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT slot_key, rates_hash, payload, created_at
-            FROM currency_posts
-            ORDER BY datetime(created_at) DESC
-            LIMIT 1
-        """)
-        row = cursor.fetchone()
-        conn.close()
+        with self._cursor(sqlite3.Row) as cursor:
+            cursor.execute("""
+                SELECT slot_key, rates_hash, payload, created_at
+                FROM currency_posts
+                ORDER BY created_at DESC
+                LIMIT 1
+            """)
+            row = cursor.fetchone()
         if not row:
             return None
 
@@ -455,12 +900,9 @@ class NewsDatabase:
         }
 
     def get_currency_rates_by_slot(self, slot_key: str) -> Optional[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT payload FROM currency_posts WHERE slot_key = ?', (slot_key,))
-        row = cursor.fetchone()
-        conn.close()
+        with self._cursor(sqlite3.Row) as cursor:
+            cursor.execute('SELECT payload FROM currency_posts WHERE slot_key = ?', (slot_key,))
+            row = cursor.fetchone()
         if not row:
             return None
         return json.loads(row['payload']) if row['payload'] else None
@@ -472,34 +914,30 @@ class NewsDatabase:
         Returns:
             Словарь со статистикой (общее количество, по категориям и т.д.)
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if hours is None:
-            cursor.execute('SELECT COUNT(*) FROM news')
-            total = cursor.fetchone()[0]
-            cursor.execute('''
-                SELECT category, COUNT(*) as count
-                FROM news
-                GROUP BY category
-            ''')
-        else:
-            safe_hours = max(int(hours), 1)
-            cursor.execute('''
-                SELECT COUNT(*) FROM news
-                WHERE datetime(created_at) > datetime('now', '-' || ? || ' hours')
-            ''', (safe_hours,))
-            total = cursor.fetchone()[0]
-            cursor.execute('''
-                SELECT category, COUNT(*) as count
-                FROM news
-                WHERE datetime(created_at) > datetime('now', '-' || ? || ' hours')
-                GROUP BY category
-            ''', (safe_hours,))
+        with self._cursor() as cursor:
+            if hours is None:
+                cursor.execute('SELECT COUNT(*) FROM news')
+                total = cursor.fetchone()[0]
+                cursor.execute('''
+                    SELECT category, COUNT(*) as count
+                    FROM news
+                    GROUP BY category
+                ''')
+            else:
+                safe_hours = max(int(hours), 1)
+                cursor.execute('''
+                    SELECT COUNT(*) FROM news
+                    WHERE created_at > datetime('now', '-' || ? || ' hours')
+                ''', (safe_hours,))
+                total = cursor.fetchone()[0]
+                cursor.execute('''
+                    SELECT category, COUNT(*) as count
+                    FROM news
+                    WHERE created_at > datetime('now', '-' || ? || ' hours')
+                    GROUP BY category
+                ''', (safe_hours,))
 
-        by_category = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        conn.close()
+            by_category = {row[0]: row[1] for row in cursor.fetchall()}
         
         return {
             'total': total,
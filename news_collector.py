@@ -8,7 +8,9 @@ import aiohttp
 import asyncio
 import html
 import re
+import sys
 from datetime import datetime
+from operator import itemgetter
 from urllib.parse import urlparse
 from typing import List, Dict, Optional
 import logging
@@ -19,6 +21,26 @@ import config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Разбор каждой записи ленты: ссылки на картинки в HTML описания и сами HTML-теги
+_IMG_SRC_RE = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def news_text(news: Dict) -> str:
+    """
+    Заголовок и описание новости одной строкой в нижнем регистре.
+    Кешируется в словаре новости и пересчитывается, только если заголовок или описание заменили.
+    """
+    title = news.get('title', '')
+    description = news.get('description', '')
+    cached = news.get('news_text_cache')
+    if cached is not None and cached[0] is title and cached[1] is description:
+        return cached[2]
+    text = f"{title} {description}".lower()
+    news['news_text_cache'] = (title, description, text)
+    return text
+
+
 class NewsCollector:
     """
     Класс для сбора новостей из RSS источников.
@@ -34,9 +56,25 @@ class NewsCollector:
         """
         self.sources = sources
         self.timeout = 10  # Таймаут для запросов в секундах
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout)
         self.retry_attempts = max(getattr(config, "RSS_FETCH_RETRY_ATTEMPTS", 3), 1)
         self.retry_backoff_seconds = max(getattr(config, "RSS_FETCH_RETRY_BACKOFF_SECONDS", 1.5), 0.1)
         self.last_fetch_stats: Dict[str, Dict[str, int]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """HTTP-сессия, общая для всех циклов сбора: keep-alive соединения и DNS-кеш переживают цикл."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(use_dns_cache=True, ttl_dns_cache=300),
+                timeout=self.client_timeout,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
 
     def extract_image_urls(self, entry) -> List[str]:
@@ -60,7 +98,7 @@ class NewsCollector:
                 image_urls.append(url)
 
         summary = entry.get('summary', '') or entry.get('description', '')
-        summary_img_urls = re.findall(r'<img[^>]+src=["\']([^"\']+)["\']', summary, flags=re.IGNORECASE)
+        summary_img_urls = _IMG_SRC_RE.findall(summary)
         image_urls.extend(summary_img_urls)
 
         deduplicated = []
@@ -86,12 +124,14 @@ class NewsCollector:
         """
         for attempt in range(1, self.retry_attempts + 1):
             try:
-                async with session.get(source['url'], timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                async with session.get(source['url']) as response:
                     if response.status == 200:
                         content = await response.text()
                         feed = feedparser.parse(content)
 
                         news_items = []
+                        # Имя источника интернируем: по нему ищем вес надёжности для каждой новости
+                        source_name = sys.intern(source['name'])
                         for entry in feed.entries[:10]:
                             title = entry.get('title', '').strip()
                             link = entry.get('link', '')
@@ -103,7 +143,7 @@ class NewsCollector:
                                 description = entry.description
 
                             image_urls = self.extract_image_urls(entry)
-                            description = re.sub(r'<[^>]+>', '', description)
+                            description = _HTML_TAG_RE.sub('', description)
                             description = html.unescape(description)
                             title = html.unescape(title)
                             description = description.strip()
@@ -121,15 +161,18 @@ class NewsCollector:
                                     pass
 
                             if title and link:
-                                news_items.append({
+                                news_item = {
                                     'title': title,
                                     'url': link,
                                     'description': description,
-                                    'source': source['name'],
+                                    'source': source_name,
                                     'category': source.get('category', 'general'),
                                     'published_at': published_time,
                                     'images': image_urls
-                                })
+                                }
+                                # Текст для фильтров и скоринга готовим сразу, пока строки «горячие»
+                                news_text(news_item)
+                                news_items.append(news_item)
 
                         return news_items
 
@@ -173,33 +216,33 @@ class NewsCollector:
         """
         all_news = []
         
-        # Создаем HTTP сессию
-        async with aiohttp.ClientSession() as session:
-            # Создаем задачи для параллельного получения новостей из всех источников
-            tasks = [self.fetch_feed(session, source) for source in self.sources]
-            
-            # Ждем выполнения всех задач
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Обрабатываем результаты
-            self.last_fetch_stats = {}
-            for source, result in zip(self.sources, results):
-                source_name = source.get('name', 'Unknown')
-                self.last_fetch_stats[source_name] = {'success': 0, 'fail': 0, 'items': 0}
-                if isinstance(result, list):
-                    all_news.extend(result)
-                    self.last_fetch_stats[source_name]['success'] = 1
-                    self.last_fetch_stats[source_name]['items'] = len(result)
-                elif isinstance(result, Exception):
-                    logger.error(f"Ошибка при сборе новостей: {str(result)}")
-                    self.last_fetch_stats[source_name]['fail'] = 1
-                else:
-                    self.last_fetch_stats[source_name]['fail'] = 1
+        # Общая HTTP сессия (живёт между циклами сбора)
+        session = await self._get_session()
+        # Создаем задачи для параллельного получения новостей из всех источников
+        tasks = [self.fetch_feed(session, source) for source in self.sources]
+        
+        # Ждем выполнения всех задач
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Обрабатываем результаты
+        self.last_fetch_stats = {}
+        for source, result in zip(self.sources, results):
+            source_name = source.get('name', 'Unknown')
+            self.last_fetch_stats[source_name] = {'success': 0, 'fail': 0, 'items': 0}
+            if isinstance(result, list):
+                all_news.extend(result)
+                self.last_fetch_stats[source_name]['success'] = 1
+                self.last_fetch_stats[source_name]['items'] = len(result)
+            elif isinstance(result, Exception):
+                logger.error("Ошибка при сборе новостей: %s", result)
+                self.last_fetch_stats[source_name]['fail'] = 1
+            else:
+                self.last_fetch_stats[source_name]['fail'] = 1
         
         # Сортируем новости по дате публикации (новые первыми)
-        all_news.sort(key=lambda x: x['published_at'], reverse=True)
+        all_news.sort(key=itemgetter('published_at'), reverse=True)
         
-        logger.info(f"Собрано новостей: {len(all_news)}")
+        logger.info("Собрано новостей: %s", len(all_news))
         return all_news
     
     def filter_new_news(self, all_news: List[Dict], database) -> List[Dict]:
@@ -214,16 +257,14 @@ class NewsCollector:
             Список новостей, которые еще не были опубликованы
         """
         new_news = []
-        
-        for news in all_news:
-            # Проверяем, была ли новость уже опубликована
-            if not database.is_news_published(
-                news['title'],
-                news['url'],
-                news['source'],
-                news.get('description', '')
-            ):
+
+        # Точные совпадения по хешу, URL и контенту отсекаем одним запросом на всю пачку
+        candidates = database.filter_new(all_news)
+
+        for news in candidates:
+            # Точные совпадения уже отсеяны, остаётся проверить похожие заголовки
+            if not database.is_similar_title_published(news['title']):
                 new_news.append(news)
         
-        logger.info(f"Новых новостей для публикации: {len(new_news)}")
+        logger.info("Новых новостей для публикации: %s", len(new_news))
         return new_news
@@ -5,7 +5,7 @@
 
 import re
 import html
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
 class PostGenerator:
@@ -22,6 +22,8 @@ class PostGenerator:
             max_length: Максимальная длина поста в символах
         """
         self.max_length = max_length
+        # Готовые строки тегов по набору категорий (набор рубрик невелик и повторяется)
+        self._category_line_cache: Dict[Tuple[str, ...], str] = {}
     
     def clean_text(self, text: str) -> str:
         """
@@ -380,6 +382,14 @@ class PostGenerator:
         }
         return emoji_map.get(category, '📰')
     
+    def _render_category_line(self, categories: Tuple[str, ...]) -> str:
+        """Формирует строку тегов для набора категорий (каждая со своим emoji)."""
+        category_tags = []
+        for cat in categories:
+            emoji = self.get_category_emoji(cat)
+            category_tags.append(f"{emoji} {cat.upper()}")
+        return " | ".join(category_tags)
+
     def add_category_tag(self, post_text: str, categories) -> str:
         """
         Добавляет тег категории (или категорий) в начало поста.
@@ -392,16 +402,10 @@ class PostGenerator:
             Текст поста с добавленным тегом категории
         """
         # Поддерживаем как одну категорию (строка), так и несколько (список)
-        if isinstance(categories, list):
-            # Если категорий несколько, показываем все с соответствующими emoji
-            category_tags = []
-            for cat in categories:
-                emoji = self.get_category_emoji(cat)
-                category_tags.append(f"{emoji} {cat.upper()}")
-            category_line = " | ".join(category_tags)
-        else:
-            # Одна категория (старый формат)
-            emoji = self.get_category_emoji(categories)
-            category_line = f"{emoji} {categories.upper()}"
+        key = tuple(categories) if isinstance(categories, list) else (categories,)
+        category_line = self._category_line_cache.get(key)
+        if category_line is None:
+            category_line = self._render_category_line(key)
+            self._category_line_cache[key] = category_line
         
         return f"{category_line}\n\n{post_text}"